@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import statistics
+import time
+import chunking
+import fakes
+import serving
+
+
+# Prompt size of serving.moderate with whole-policy retrieval (RETRIEVAL_MODE=document) versus
+# passage retrieval (RETRIEVAL_MODE=passage), with stubbed upstreams. The prompt token counts are
+# real; the latencies are simulated: the fake LLM charges --llm-latency plus
+# --llm-latency-per-token for every prompt token, so they only show what that assumed cost model
+# predicts, not what a real completion endpoint would do.
+#
+#   python bench_chunking.py --requests 200 --policy-words 400
+
+
+async def run(mode, args):
+    chunking.RETRIEVAL_MODE = mode
+    llm = fakes.install_fakes(
+        policies=fakes.fake_policies(count=args.policies, words=args.policy_words),
+        encode_latency=args.encode_latency, vector_latency=args.vector_latency, passages=mode == "passage",
+        async_openai=fakes.FakeAsyncOpenAI(latency=args.llm_latency, latency_per_prompt_token=args.llm_latency_per_token),
+    )
+    semaphore = asyncio.Semaphore(args.clients)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await serving.moderate(f"{mode} post number {i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "seconds": elapsed,
+        "prompt_tokens": statistics.mean(llm.prompt_tokens),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--policies", type=int, default=30)
+    parser.add_argument("--policy-words", type=int, default=400)
+    parser.add_argument("--encode-latency", type=float, default=0.01)
+    parser.add_argument("--vector-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency-per-token", type=float, default=0.0002)
+    args = parser.parse_args()
+
+    print(f"Simulated LLM: {args.llm_latency * 1000:.0f}ms + {args.llm_latency_per_token * 1000:.2f}ms per prompt token")
+    reports = {}
+    for mode in ["document", "passage"]:
+        reports[mode] = report = asyncio.run(run(mode, args))
+        print(f"{mode:>8}: {report['prompt_tokens']:.0f} prompt tokens on average; "
+              f"simulated latency p50 {report['p50_ms']:.0f}ms, p99 {report['p99_ms']:.0f}ms "
+              f"({report['requests']} requests in {report['seconds']:.2f}s)")
+    print(f"Prompt tokens: {reports['document']['prompt_tokens']:.0f} -> {reports['passage']['prompt_tokens']:.0f} "
+          f"({reports['passage']['prompt_tokens'] / reports['document']['prompt_tokens']:.0%} of whole-policy prompts)")
+
+
+if __name__ == "__main__":
+    main_cli()
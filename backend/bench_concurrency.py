@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import fakes
+import main
+import moderation
+
+
+# Throughput of /llm-response under concurrent clients, with stubbed upstreams.
+# Compares the awaitable request path against the previous blocking one
+# (similarity_search + check_policies called directly inside the async handler).
+#
+#   python bench_concurrency.py --clients 50 --requests 500
+
+
+@main.app.post("/bench/blocking-llm-response")
+async def blocking_llm_response_f(text: str) -> dict:
+
+    policies = moderation.similarity_search(text)
+
+    generated_response = moderation.check_policies(text, policies)
+
+    return {"generated_response" : generated_response}
+
+
+async def run(name, path, clients, total):
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"{name} post number {i}")
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def worker():
+            while not queue.empty():
+                text = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post(path, params={"text": text})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "seconds": elapsed,
+        "requests_per_second": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--encode-latency", type=float, default=0.01)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--warehouse-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    fakes.install_fakes(encode_latency=args.encode_latency, vector_latency=args.vector_latency,
+                        warehouse_latency=args.warehouse_latency, llm_latency=args.llm_latency)
+
+    # The blocking path serializes everything, so a smaller run is enough to measure it
+    blocking_requests = max(args.clients, args.requests // 10)
+
+    for name, path, total in [
+        ("blocking", "/bench/blocking-llm-response", blocking_requests),
+        ("async", "/llm-response", args.requests),
+    ]:
+        report = asyncio.run(run(name, path, args.clients, total))
+        print(f"{name:>8}: {report['requests']} requests with {args.clients} clients in {report['seconds']:.2f}s "
+              f"-> {report['requests_per_second']:.1f} req/s, p50 {report['p50_ms']:.0f}ms, p99 {report['p99_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
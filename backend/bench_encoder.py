@@ -0,0 +1,154 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+import numpy as np
+import chunking
+import encoders
+import resources
+from ingestion import index_items
+from scraping import read_policies_csv
+from vector_store import LocalVectorStore
+
+
+# Speed and retrieval accuracy of the optimized encoder backends against fp32 PyTorch.
+# For each backend it reports corpus throughput (sentences/sec, batched like vectorize_policies)
+# and single-post latency (p50 / p99, like a request), then checks that policy retrieval returns
+# the same top-k as the fp32 encoder:
+#   rebuilt - index and posts both encoded with the backend (after a re-vectorize)
+#   mixed   - fp32 index, posts encoded with the backend (right after switching, before re-vectorizing)
+# The corpus follows RETRIEVAL_MODE (whole policies or passages). Exits non-zero when top-k
+# agreement is below --min-agreement, so it can gate turning a backend on.
+#
+#   python bench_encoder.py --policies reddit_policies.csv --backends torch-int8 onnx onnx-int8
+
+SAMPLE_POSTS = [
+    "Check out my new puppy, he is the best boy",
+    "Anyone else think the mods here are completely useless? Ban them all",
+    "Selling cheap followers and upvotes, DM me for prices",
+    "Here is the home address of the guy who cut me off today, you know what to do",
+    "What is the best way to learn Python as a beginner?",
+    "I will find you and make you regret posting this",
+    "Leaked photos of my ex, upvote if you want more",
+    "Great recipe for banana bread, my grandma's secret",
+    "Buy this miracle pill, cures cancer in a week, doctors hate it",
+    "Posting the same link in 50 subreddits to get it trending",
+    "This group of people should not be allowed to vote",
+    "Does anyone know how to get a refund from this game store?",
+]
+
+
+def load_queries(path, corpus_texts):
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    # Sample posts plus the opening of every corpus entry, so every policy is a likely match once
+    return SAMPLE_POSTS + [" ".join(text.split()[:30]) for text in corpus_texts]
+
+
+def build_index(ids, vectors):
+    store = LocalVectorStore(path=None)
+    store.upsert(list(zip(ids, vectors)))
+    return store
+
+
+def top_k_ids(store, vectors, top_k):
+    return [[match["id"] for match in store.query(vector, top_k)] for vector in vectors]
+
+
+def agreement(expected, actual):
+    same_set = sum(set(a) == set(b) for a, b in zip(expected, actual)) / len(expected)
+    same_order = sum(a == b for a, b in zip(expected, actual)) / len(expected)
+    return same_set, same_order
+
+
+def measure(encoder, corpus_texts, queries, batch_size, runs):
+    encoder.encode(queries[:batch_size], batch_size=batch_size)  # warm up
+
+    start = time.perf_counter()
+    corpus_vectors = encoder.encode(corpus_texts, batch_size=batch_size)
+    sentences_per_second = len(corpus_texts) / (time.perf_counter() - start)
+
+    query_vectors = np.stack([encoder.encode(query) for query in queries])
+
+    latencies = []
+    for i in range(runs):
+        start = time.perf_counter()
+        encoder.encode(queries[i % len(queries)])
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    return {
+        "corpus_vectors": np.asarray(corpus_vectors, dtype=np.float32),
+        "query_vectors": np.asarray(query_vectors, dtype=np.float32),
+        "sentences_per_second": sentences_per_second,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000,
+    }
+
+
+def cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--policies", default="reddit_policies.csv", help="scraped policy CSV (key, value)")
+    parser.add_argument("--queries", help="text file with one post per line (default: built-in sample)")
+    parser.add_argument("--backends", nargs="+", default=[b for b in encoders.BACKENDS if b != "torch"])
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="default: 6 for documents, PASSAGE_TOP_K for passages")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--runs", type=int, default=300, help="single-post encodes for the latency percentiles")
+    parser.add_argument("--min-agreement", type=float, default=1.0,
+                        help="required fraction of posts with an identical top-k set")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.policies):
+        sys.exit(f"{args.policies} not found; scrape the policies first (scraping.scrape_reddit_policies)")
+
+    items = list(index_items(read_policies_csv(args.policies).items()))
+    ids = [item[0] for item in items]
+    corpus_texts = [item[1] for item in items]
+    queries = load_queries(args.queries, corpus_texts)
+    top_k = args.top_k or (chunking.PASSAGE_TOP_K if chunking.RETRIEVAL_MODE == "passage" else 6)
+    top_k = min(top_k, len(ids))
+    print(f"{len(ids)} {chunking.RETRIEVAL_MODE} vectors, {len(queries)} posts, top-{top_k}")
+
+    baseline = measure(encoders.load_encoder(resources.MODEL_NAME, "torch"), corpus_texts, queries,
+                       args.batch_size, args.runs)
+    baseline_index = build_index(ids, baseline["corpus_vectors"])
+    expected = top_k_ids(baseline_index, baseline["query_vectors"], top_k)
+    print(f"{'torch':>11}: {baseline['sentences_per_second']:.1f} sentences/sec, "
+          f"p50 {baseline['p50_ms']:.1f}ms, p99 {baseline['p99_ms']:.1f}ms")
+
+    failures = []
+    for backend in args.backends:
+        result = measure(encoders.load_encoder(resources.MODEL_NAME, backend), corpus_texts, queries,
+                         args.batch_size, args.runs)
+
+        rebuilt = agreement(expected, top_k_ids(build_index(ids, result["corpus_vectors"]),
+                                                result["query_vectors"], top_k))
+        mixed = agreement(expected, top_k_ids(baseline_index, result["query_vectors"], top_k))
+        similarity = cosine(baseline["corpus_vectors"], result["corpus_vectors"])
+
+        print(f"{backend:>11}: {result['sentences_per_second']:.1f} sentences/sec "
+              f"({result['sentences_per_second'] / baseline['sentences_per_second']:.2f}x), "
+              f"p50 {result['p50_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms; "
+              f"top-k same set {rebuilt[0]:.1%} / same order {rebuilt[1]:.1%} (rebuilt), "
+              f"{mixed[0]:.1%} / {mixed[1]:.1%} (mixed); "
+              f"min cosine to fp32 {similarity.min():.4f}")
+
+        if min(rebuilt[0], mixed[0]) < args.min_agreement:
+            failures.append(backend)
+
+    for backend in failures:
+        print(f"FAIL: {backend} changes the retrieved top-k for some posts")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,73 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# Cold import time of the API and of the policy pipeline modules, each measured in a fresh
+# interpreter. Also checks that importing the serving process does not pull in the heavy
+# dependencies that are meant to load lazily (torch via sentence_transformers, the scraping stack,
+# the Snowflake connector, ...). Exits non-zero when a check fails, so it can guard CI:
+#
+#   python bench_import_time.py --runs 5 --max-seconds 1.5
+
+# Modules that must not be imported just by starting the API
+SERVING_FORBIDDEN = [
+    "torch", "sentence_transformers", "transformers", "onnxruntime", "openai", "pinecone",
+    "snowflake.connector", "selenium", "webdriver_manager", "bs4", "requests", "pandas", "streamlit", "boto3",
+]
+
+TARGETS = ["main", "warehouse", "moderation", "scraping", "ingestion"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure(module):
+    output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                            capture_output=True, text=True, check=True).stdout
+    # Module-level prints may come first; the probe result is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=1.5,
+                        help="budget for the median cold import of main")
+    parser.add_argument("--targets", nargs="*", default=TARGETS)
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.targets:
+        try:
+            results = [measure(module) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{module:>11}: import failed\n{e.stderr}")
+            failures.append(f"{module} failed to import")
+            continue
+
+        seconds = statistics.median(result["seconds"] for result in results)
+        print(f"{module:>11}: {seconds * 1000:.0f}ms median over {args.runs} runs, "
+              f"{len(results[0]['modules'])} modules loaded")
+
+        if module == "main":
+            loaded = [name for name in SERVING_FORBIDDEN if name in results[0]["modules"]]
+            if loaded:
+                failures.append(f"importing main loads {', '.join(loaded)}")
+            if seconds > args.max_seconds:
+                failures.append(f"importing main took {seconds:.2f}s, budget is {args.max_seconds:.2f}s")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
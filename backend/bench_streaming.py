@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import httpx
+import uvicorn
+from openai import AsyncOpenAI
+import fakes
+import main
+import stub_model_server
+
+
+# Time-to-first-verdict of /llm-response/stream against the full latency of /llm-response.
+# The completion comes from stub_model_server.py over real HTTP, so the OpenAI client streams
+# exactly as it would against the API; the encoder, the index and the policy table are fakes.
+# Both servers run under uvicorn in this process (httpx's ASGI transport buffers whole responses,
+# which would hide the streaming).
+#
+#   python bench_streaming.py --requests 100 --clients 10
+
+
+def serve(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def read_events(response):
+    # Yields (event, data) from a server-sent event stream
+    event = None
+    async for line in response.aiter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            yield event, json.loads(line[len("data: "):])
+
+
+async def stream_request(client, text):
+    start = time.perf_counter()
+    first_verdict = None
+    async with client.stream("POST", "/llm-response/stream", params={"text": text}) as response:
+        response.raise_for_status()
+        async for event, data in read_events(response):
+            if event == "verdict" and first_verdict is None:
+                first_verdict = time.perf_counter() - start
+            elif event == "error":
+                raise RuntimeError(data["detail"])
+    return first_verdict, time.perf_counter() - start
+
+
+async def blocking_request(client, text):
+    start = time.perf_counter()
+    response = await client.post("/llm-response", params={"text": text})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+async def run(name, request, api_url, clients, total):
+    verdict_latencies = []
+    complete_latencies = []
+    semaphore = asyncio.Semaphore(clients)
+
+    async with httpx.AsyncClient(base_url=api_url, timeout=None) as client:
+
+        async def one(i):
+            async with semaphore:
+                verdict, complete = await request(client, f"{name} post number {i}")
+                verdict_latencies.append(verdict)
+                complete_latencies.append(complete)
+
+        await asyncio.gather(*(one(i) for i in range(total)))
+
+    return {
+        "verdict_p50_ms": statistics.median(verdict_latencies) * 1000,
+        "verdict_p99_ms": sorted(verdict_latencies)[int(total * 0.99) - 1] * 1000,
+        "complete_p50_ms": statistics.median(complete_latencies) * 1000,
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--api-port", type=int, default=8010)
+    parser.add_argument("--model-port", type=int, default=8011)
+    parser.add_argument("--encode-latency", type=float, default=0.01)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub_model_server.configure(args.first_token_latency, args.token_latency)
+    serve(stub_model_server.app, args.model_port)
+
+    fakes.install_fakes(
+        encode_latency=args.encode_latency, vector_latency=args.vector_latency,
+        async_openai=AsyncOpenAI(base_url=f"http://127.0.0.1:{args.model_port}/v1", api_key="stub", max_retries=0),
+    )
+    serve(main.app, args.api_port)
+    api_url = f"http://127.0.0.1:{args.api_port}"
+
+    for name, request in [("blocking", blocking_request), ("stream", stream_request)]:
+        report = asyncio.run(run(name, request, api_url, args.clients, args.requests))
+        print(f"{name:>8}: verdict p50 {report['verdict_p50_ms']:.0f}ms, p99 {report['verdict_p99_ms']:.0f}ms; "
+              f"complete response p50 {report['complete_p50_ms']:.0f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
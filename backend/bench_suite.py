@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import httpx
+import basic_functions
+import chunking
+import fakes
+import main
+import metrics
+import resources
+from verdict_cache import VerdictCache
+
+
+# Offline benchmark suite for the backend: every upstream is an in-process fake from fakes.py
+# (encoder, vector index, the Snowflake policy table, OpenAI), each with its own injected latency.
+# For every target and concurrency level it sends --requests requests from that many clients and
+# reports throughput and p50 / p95 / p99 latency, for the whole request and for each stage
+# (encode, vector_query, policy_lookup, verdict_cache, completion, ...), taken from the stage
+# timings the API already records for /metrics.
+#   llm-response         POST /llm-response
+#   llm-response-stream  POST /llm-response/stream, until the "done" event
+#   llm-response-batch   POST /llm-response/batch with --batch-size posts (latency is per batch)
+#   basic_functions      cached_verdict, then similarity_search + complete on a miss (the blocking path)
+# --output writes the run as JSON (settings, git commit, results); --compare prints the change
+# against an earlier JSON run and, with --max-regression, fails when a p99 got worse.
+#
+#   python bench_suite.py --concurrency 1 10 50 --requests 200 --output bench.json
+#   python bench_suite.py --llm-latency 1.0 --compare bench.json --max-regression 0.1
+
+TARGETS = ["llm-response", "llm-response-stream", "llm-response-batch", "basic_functions"]
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, q):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(seconds):
+    values = sorted(seconds)
+    summary = {"count": len(values)}
+    for q in PERCENTILES:
+        value = percentile(values, q)
+        summary[f"p{q}_ms"] = value * 1000 if value is not None else None
+    summary["mean_ms"] = sum(values) / len(values) * 1000 if values else None
+    summary["max_ms"] = values[-1] * 1000 if values else None
+    return summary
+
+
+def post_texts(args, target, concurrency):
+    # Unique posts, except for --duplicate-ratio of them drawn from a few hot ones (reposts, bot
+    # waves), which exercise the verdict cache and single-flight
+    rng = random.Random(args.seed)
+    hot = [f"hot post number {i}" for i in range(args.hot_posts)]
+    return [
+        rng.choice(hot) if rng.random() < args.duplicate_ratio else f"{target} c{concurrency} post number {i}"
+        for i in range(args.requests * (args.batch_size if target == "llm-response-batch" else 1))
+    ]
+
+
+async def http_request(client, target, payload):
+    if target == "llm-response":
+        response = await client.post("/llm-response", params={"text": payload})
+        response.raise_for_status()
+    elif target == "llm-response-stream":
+        response = await client.post("/llm-response/stream", params={"text": payload})
+        response.raise_for_status()
+        if "event: error" in response.text or "event: done" not in response.text:
+            raise RuntimeError(f"stream did not finish: {response.text[-200:]}")
+    else:
+        response = await client.post("/llm-response/batch", json={"posts": payload})
+        response.raise_for_status()
+        errors = [result["error"] for result in response.json()["results"] if result.get("error")]
+        if errors:
+            raise RuntimeError(errors[0])
+
+
+async def run_http(target, payloads, concurrency):
+    latencies = []
+    errors = []
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def worker():
+            while not queue.empty():
+                payload = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    await http_request(client, target, payload)
+                except Exception as e:
+                    errors.append(str(e) or type(e).__name__)
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    return latencies, errors
+
+
+def run_basic_functions(texts, concurrency, record_stage):
+    latencies = []
+    errors = []
+
+    def one(text):
+        start = time.perf_counter()
+        try:
+            # Same order as basic_functions.moderate, timed per step
+            cached_response = basic_functions.cached_verdict(text)
+            record_stage("verdict_cache", time.perf_counter() - start)
+            if cached_response is None:
+                searched = time.perf_counter()
+                policies = basic_functions.similarity_search(text)
+                record_stage("similarity_search", time.perf_counter() - searched)
+                completed = time.perf_counter()
+                basic_functions.complete(text, policies)
+                record_stage("complete", time.perf_counter() - completed)
+        except Exception as e:
+            errors.append(str(e) or type(e).__name__)
+        else:
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, texts))
+
+    return latencies, errors
+
+
+def run(args, target, concurrency):
+    texts = post_texts(args, target, concurrency)
+    if target == "llm-response-batch":
+        payloads = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+    else:
+        payloads = texts
+
+    # Fresh memory-only verdict cache, so only this run's duplicates are served from it
+    resources.set_resources(verdict_cache=VerdictCache(path=""))
+
+    stages = {}
+
+    def record_stage(stage, seconds):
+        stages.setdefault(stage, []).append(seconds)
+
+    metrics.add_stage_listener(record_stage)
+    # The request path prints every match and completion; keep the report readable
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        try:
+            if target == "basic_functions":
+                latencies, errors = run_basic_functions(payloads, concurrency, record_stage)
+            else:
+                latencies, errors = asyncio.run(run_http(target, payloads, concurrency))
+        finally:
+            metrics.remove_stage_listener(record_stage)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "requests": len(payloads),
+        "posts": len(texts),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "posts_per_second": len(latencies) * len(texts) / len(payloads) / elapsed,
+        "latency": summarize(latencies),
+        "stages": {stage: summarize(seconds) for stage, seconds in sorted(stages.items())},
+    }
+
+
+def print_result(result):
+    latency = result["latency"]
+    print(f"{result['target']:>19} x{result['concurrency']:<4} {result['requests']} requests in {result['seconds']:.2f}s "
+          f"-> {result['requests_per_second']:.1f} req/s ({result['posts_per_second']:.1f} posts/s), "
+          f"p50 {latency['p50_ms'] or 0:.0f}ms, p95 {latency['p95_ms'] or 0:.0f}ms, p99 {latency['p99_ms'] or 0:.0f}ms"
+          + (f", {result['errors']} errors (first: {result['first_error']})" if result["errors"] else ""))
+    for stage, summary in result["stages"].items():
+        print(f"{'':>26}{stage:<20} n={summary['count']:<6} p50 {summary['p50_ms']:.1f}ms, "
+              f"p95 {summary['p95_ms']:.1f}ms, p99 {summary['p99_ms']:.1f}ms")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old):
+    if new is None or not old:
+        return None
+    return (new - old) / old
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(result["target"], result["concurrency"]): result for result in baseline["results"]}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('git_commit') or 'unknown'}, {baseline.get('created')}):")
+    regressions = []
+    for result in results:
+        old = previous.get((result["target"], result["concurrency"]))
+        if old is None:
+            continue
+        throughput = change(result["requests_per_second"], old["requests_per_second"])
+        p50 = change(result["latency"]["p50_ms"], old["latency"]["p50_ms"])
+        p99 = change(result["latency"]["p99_ms"], old["latency"]["p99_ms"])
+        print(f"{result['target']:>19} x{result['concurrency']:<4} throughput {throughput or 0:+.1%}, "
+              f"p50 {p50 or 0:+.1%}, p99 {p99 or 0:+.1%}")
+        if max_regression is not None and p99 is not None and p99 > max_regression:
+            regressions.append(f"{result['target']} x{result['concurrency']}")
+
+    for regression in regressions:
+        print(f"FAIL: p99 of {regression} regressed by more than {max_regression:.0%}")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=TARGETS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=200, help="requests per target and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=16, help="posts per /llm-response/batch request")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="fraction of posts repeated from a small hot set")
+    parser.add_argument("--hot-posts", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--encode-latency", type=float, default=0.01)
+    parser.add_argument("--vector-latency", type=float, default=0.03)
+    parser.add_argument("--warehouse-latency", type=float, default=0.005)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="time to the first completion token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="time per completion token (async client)")
+    parser.add_argument("--output", help="write the run as JSON to this file")
+    parser.add_argument("--compare", help="earlier JSON run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="with --compare, exit non-zero when a p99 grew by more than this fraction")
+    args = parser.parse_args()
+
+    fakes.install_fakes(
+        encode_latency=args.encode_latency, vector_latency=args.vector_latency,
+        warehouse_latency=args.warehouse_latency, llm_latency=args.llm_latency,
+        async_openai=fakes.FakeAsyncOpenAI(latency=args.llm_latency, token_latency=args.token_latency),
+    )
+    print(f"Fakes: encode {args.encode_latency * 1000:.0f}ms, vector query {args.vector_latency * 1000:.0f}ms, "
+          f"warehouse {args.warehouse_latency * 1000:.0f}ms, completion {args.llm_latency * 1000:.0f}ms "
+          f"+ {args.token_latency * 1000:.0f}ms/token; {chunking.RETRIEVAL_MODE} retrieval")
+
+    results = []
+    for target in args.targets:
+        for concurrency in args.concurrency:
+            result = run(args, target, concurrency)
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        report = {
+            "suite": "safefeed-backend",
+            "format": 1,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "settings": vars(args),
+            "retrieval_mode": chunking.RETRIEVAL_MODE,
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
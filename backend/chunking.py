@@ -0,0 +1,86 @@
+import os
+import re
+
+
+# Passage-level retrieval. Policies are split into overlapping word windows that are embedded
+# separately; a query retrieves the best passages and the prompt gets as many of them as fit in a
+# token budget, instead of the full text of the top 6 policies.
+#   RETRIEVAL_MODE=document  whole policies, as before (default)
+#   RETRIEVAL_MODE=passage   chunked policies
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "document").lower()
+
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "120"))
+CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "30"))
+
+PASSAGE_TOP_K = int(os.getenv("PASSAGE_TOP_K", "20"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+
+_word = re.compile(r"\S+")
+
+
+def chunk_id(key, index):
+    return f"{key}#{index}"
+
+
+def parent_key(passage_id):
+    return passage_id.rsplit("#", 1)[0]
+
+
+def chunk_policy(key, text, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    # Returns [{'id', 'parent', 'index', 'start', 'end', 'text'}]; start/end are character offsets
+    # into text, so a passage can always be rebuilt from its parent policy
+    words = [(match.start(), match.end()) for match in _word.finditer(text or "")]
+    if not words:
+        return []
+
+    step = max(chunk_words - overlap_words, 1)
+    chunks = []
+    for index, first in enumerate(range(0, len(words), step)):
+        last = min(first + chunk_words, len(words)) - 1
+        start, end = words[first][0], words[last][1]
+        chunks.append({
+            "id": chunk_id(key, index),
+            "parent": key,
+            "index": index,
+            "start": start,
+            "end": end,
+            "text": text[start:end],
+        })
+        if last == len(words) - 1:
+            break
+
+    return chunks
+
+
+def chunk_policies(policies, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    # policies: iterable of (key, text) -> iterable of chunks
+    for key, text in policies:
+        yield from chunk_policy(key, text, chunk_words, overlap_words)
+
+
+def estimate_tokens(text):
+    # Roughly 4 characters per token for English text; close enough for budgeting a prompt
+    return max(1, len(text) // 4)
+
+
+def assemble_passages(matches, passages, token_budget=PROMPT_TOKEN_BUDGET):
+    # matches: [{'id', 'score'}] best first; passages: {passage id: chunk}.
+    # Greedily keeps the best passages that fit the budget, then groups them by parent policy
+    # (in order of each policy's best passage) and joins them in document order.
+    selected = {}
+    used = 0
+    for match in matches:
+        chunk = passages.get(match['id'])
+        if chunk is None:
+            continue
+        tokens = estimate_tokens(chunk["text"])
+        if used + tokens > token_budget:
+            continue
+        used += tokens
+        selected.setdefault(chunk["parent"], []).append(chunk)
+
+    return {
+        parent: " ... ".join(chunk["text"] for chunk in sorted(chunks, key=lambda chunk: chunk["index"]))
+        for parent, chunks in selected.items()
+    }
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import numpy as np
+
+
+# Sentence encoder backends for policies and posts, selected with the ENCODER_BACKEND env var:
+#   torch       - SentenceTransformer in fp32 PyTorch (default)
+#   torch-int8  - the same model with its Linear layers dynamically quantized to int8
+#   onnx        - the transformer exported to an ONNX graph, run by onnxruntime
+#   onnx-int8   - the exported graph with int8 dynamically quantized weights
+# Every backend exposes the two SentenceTransformer methods the pipeline uses, encode() and
+# get_sentence_embedding_dimension(), and returns the same pooled (and normalized, if the model
+# normalizes) embeddings. ONNX graphs are exported once into ENCODER_CACHE_DIR and reused.
+# Vectors from different backends are close but not identical; bench_encoder.py checks that
+# policy retrieval still returns the same top-k before a backend is switched on.
+
+BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".safefeed", "encoders")
+
+
+def encoder_backend():
+    backend = os.getenv("ENCODER_BACKEND", "torch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ENCODER_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def export_dir(model_name):
+    # A model saved to a local directory (e.g. inside a policy snapshot) keeps its graphs next to it
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, "onnx")
+    cache_dir = os.getenv("ENCODER_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def export_onnx(model_name, directory):
+    # Writes model.onnx, model-int8.onnx, the tokenizer and encoder.json (pooling settings)
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = next(module for module in model if isinstance(module, Pooling))
+    if not pooling.pooling_mode_mean_tokens:
+        raise ValueError(f"{model_name} does not use mean pooling, which is the only pooling the ONNX encoder implements")
+
+    class LastHiddenState(torch.nn.Module):
+
+        def __init__(self, transformer):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                    token_type_ids=token_type_ids).last_hidden_state
+
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = model.tokenizer
+    sample = tokenizer(["policy export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+
+    fp32_path = os.path.join(directory, "model.onnx")
+    tmp_path = fp32_path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(model[0].auto_model).eval(),
+            tuple(sample[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    os.replace(tmp_path, fp32_path)
+
+    quantize_dynamic(fp32_path, os.path.join(directory, "model-int8.onnx"), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(directory)
+    with open(os.path.join(directory, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "dimension": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+            "normalize": any(isinstance(module, Normalize) for module in model),
+        }, f, indent=2)
+
+    print(f"Exported '{model_name}' to {directory}")
+
+
+class OnnxEncoder:
+
+    def __init__(self, directory, quantized=False):
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(directory, "encoder.json"), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        threads = int(os.getenv("ENCODER_THREADS", "0"))  # 0 lets onnxruntime pick
+        if threads:
+            options.intra_op_num_threads = threads
+
+        path = os.path.join(directory, "model-int8.onnx" if quantized else "model.onnx")
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dimension"]
+
+    def _encode_batch(self, sentences):
+        tokens = self.tokenizer(sentences, padding=True, truncation=True, max_length=self.config["max_seq_length"],
+                                return_tensors="np")
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+
+        # Mean pooling over the real tokens, as the SentenceTransformer Pooling module does
+        mask = tokens["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config["normalize"]:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # Sorting by length keeps padding inside each batch small
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        vectors = np.zeros((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._encode_batch([sentences[row] for row in rows])
+
+        return vectors[0] if single else vectors
+
+
+def load_encoder(model_name, backend=None):
+    backend = backend or encoder_backend()
+
+    if backend in ("torch", "torch-int8"):
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device="cpu")
+        if backend == "torch-int8":
+            import torch
+
+            torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+
+    directory = export_dir(model_name)
+    if not os.path.exists(os.path.join(directory, "encoder.json")):
+        export_onnx(model_name, directory)
+    return OnnxEncoder(directory, quantized=backend == "onnx-int8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the ONNX encoder graphs ahead of deployment")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    export_onnx(args.model, export_dir(args.model))
@@ -0,0 +1,177 @@
+import asyncio
+import hashlib
+import re
+import time
+from types import SimpleNamespace
+import numpy as np
+import chunking
+from chunking import chunk_policies, estimate_tokens
+from vector_store import LocalVectorStore
+
+
+# In-process stand-ins for the encoder, the vector index, the policy table and OpenAI.
+# Each one sleeps for a configurable latency, so the API can be benchmarked without live
+# services. install_fakes() puts them in place of the real resources and policy store.
+
+DIMENSION = 384
+
+FAKE_RESPONSE = "Policy Violation: False\nReason: "
+
+
+def fake_vector(text, dimension=DIMENSION):
+    # Deterministic pseudo-embedding so identical texts map to identical vectors
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+
+class FakeEncoder:
+
+    def __init__(self, latency=0.01, dimension=DIMENSION):
+        self.latency = latency
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        # One forward pass per mini-batch
+        batches = (len(sentences) + batch_size - 1) // batch_size
+        time.sleep(self.latency * max(batches, 1))
+
+        vectors = np.stack([fake_vector(sentence, self.dimension) for sentence in sentences])
+        return vectors[0] if single else vectors
+
+
+class FakeVectorStore(LocalVectorStore):
+
+    def __init__(self, policies, latency=0.02, dimension=DIMENSION, passages=False):
+        super().__init__(path=None)
+        self.latency = latency
+        if passages:
+            items = [(chunk["id"], fake_vector(chunk["text"], dimension)) for chunk in chunk_policies(policies.items())]
+        else:
+            items = [(key, fake_vector(value, dimension)) for key, value in policies.items()]
+        self.upsert(items)
+
+    def query(self, vector, top_k):
+        time.sleep(self.latency)
+        return super().query(vector, top_k)
+
+    def save(self):
+        pass
+
+
+class FakePolicyStore:
+
+    def __init__(self, policies, latency=0.0, version="fake"):
+        self.policies = dict(policies)
+        self.passages = None
+        self.latency = latency
+        self.version = version
+
+    def refresh(self, force=False):
+        pass
+
+    def invalidate(self):
+        pass
+
+    def get(self, keys):
+        if self.latency:
+            time.sleep(self.latency)
+        return {key: self.policies[key] for key in keys if key in self.policies}
+
+    def get_passages(self, passage_ids):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.passages is None:
+            self.passages = {chunk["id"]: chunk for chunk in chunk_policies(self.policies.items())}
+        return {passage_id: self.passages[passage_id] for passage_id in passage_ids if passage_id in self.passages}
+
+    def all(self):
+        return dict(self.policies)
+
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(text=text)])
+
+
+class FakeOpenAI:
+
+    def __init__(self, latency=0.5, response=FAKE_RESPONSE):
+        self.latency = latency
+        self.response = response
+        self.completions = SimpleNamespace(create=self._create)
+
+    def _create(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return _completion(self.response)
+
+
+def stream_tokens(text):
+    # Splits a completion into word-sized chunks, whitespace included, like a streamed response
+    return re.findall(r"\s*\S+|\s+", text)
+
+
+class FakeAsyncOpenAI:
+
+    def __init__(self, latency=0.5, response=FAKE_RESPONSE, latency_per_prompt_token=0.0, token_latency=0.0):
+        self.latency = latency
+        self.latency_per_prompt_token = latency_per_prompt_token
+        self.token_latency = token_latency
+        self.response = response
+        self.prompt_tokens = []
+        self.completions = SimpleNamespace(create=self._create)
+
+    async def _create(self, prompt, stream=False, **kwargs):
+        tokens = estimate_tokens(prompt)
+        self.prompt_tokens.append(tokens)
+        # Prompt processing time grows with the prompt
+        await asyncio.sleep(self.latency + self.latency_per_prompt_token * tokens)
+        if stream:
+            return self._stream()
+        # A complete response costs the generation time of every token
+        await asyncio.sleep(self.token_latency * len(stream_tokens(self.response)))
+        return _completion(self.response)
+
+    async def _stream(self):
+        for token in stream_tokens(self.response):
+            await asyncio.sleep(self.token_latency)
+            yield _completion(token)
+
+
+def fake_policies(count=30, words=400):
+    return {
+        f"policy_{i}": " ".join(f"rule{i}_{j}" for j in range(words))
+        for i in range(count)
+    }
+
+
+def install_fakes(policies=None, encode_latency=0.01, vector_latency=0.02, warehouse_latency=0.0,
+                  llm_latency=0.5, async_openai=None, passages=None):
+    # Replaces the encoder, vector store, OpenAI clients, verdict cache and policy store of this
+    # process. async_openai overrides the fake async client (e.g. a client for a stub model
+    # server); passages defaults to the current RETRIEVAL_MODE. Returns the async client.
+    import resources
+    import warehouse
+    from verdict_cache import VerdictCache
+
+    policies = policies if policies is not None else fake_policies()
+    if passages is None:
+        passages = chunking.RETRIEVAL_MODE == "passage"
+    if async_openai is None:
+        async_openai = FakeAsyncOpenAI(latency=llm_latency)
+
+    resources.set_resources(
+        model=FakeEncoder(latency=encode_latency),
+        store=FakeVectorStore(policies, latency=vector_latency, passages=passages),
+        openai=FakeOpenAI(latency=llm_latency),
+        async_openai=async_openai,
+        # Memory-only, so a benchmark never reads or fills the shared cache file
+        verdict_cache=VerdictCache(path=""),
+    )
+    warehouse.policy_store = FakePolicyStore(policies, latency=warehouse_latency)
+    return async_openai
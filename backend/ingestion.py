@@ -0,0 +1,279 @@
+import csv
+import os
+import time
+import chunking
+import resources
+import warehouse
+from policy_manifest import content_hash, diff_policies, load_manifest, policy_set_version, save_manifest
+from policy_scraper import CONTENT_NOT_FOUND, PolicyScraper
+from scraping import read_policies_csv
+from warehouse import POLICY_TABLE, create_policy_tables, iter_policies, publish_policy_version, snowflake_pool
+
+
+# Ingestion side of the policy pipeline: load the scraped policies into Snowflake, embed them
+# into the vector store, and the incremental refresh that does both for changed policies only.
+# Only the admin jobs import this module.
+
+
+# Multi-row INSERT batches are capped by row count and by payload size, to stay well under
+# Snowflake's statement size limit when policy texts are long
+INSERT_BATCH_ROWS = int(os.getenv("INSERT_BATCH_ROWS", "1000"))
+INSERT_BATCH_BYTES = int(os.getenv("INSERT_BATCH_BYTES", str(4 * 1024 * 1024)))
+
+
+def iter_insert_batches(rows, max_rows=INSERT_BATCH_ROWS, max_bytes=INSERT_BATCH_BYTES):
+    batch = []
+    batch_bytes = 0
+    for row in rows:
+        row_bytes = sum(len(value.encode('utf-8')) for value in row)
+        if batch and (len(batch) == max_rows or batch_bytes + row_bytes > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
+
+def upload_policies_to_snowflake(file_path='reddit_policies.csv', progress=None):
+    table_name = POLICY_TABLE
+
+    policies = read_policies_csv(file_path)
+    start = time.perf_counter()
+    report = {"rows": 0, "seconds": 0.0, "rows_per_second": 0.0, "version": None}
+
+    try:
+        with snowflake_pool.cursor() as cur:
+            create_policy_tables(cur)
+
+            # The whole policy set is replaced atomically: readers see either the old set or the
+            # new one, and a failed or repeated run leaves exactly one copy of each policy
+            cur.execute("BEGIN")
+            cur.execute(f"DELETE FROM {table_name}")
+
+            insert_query = f"INSERT INTO {table_name} (key, value) VALUES (%s, %s)"
+            for batch in iter_insert_batches(policies.items()):
+                # executemany sends the whole batch as one multi-row INSERT
+                cur.executemany(insert_query, batch)
+                report["rows"] += len(batch)
+                print(f"Inserted {report['rows']}/{len(policies)} rows")
+                if progress:
+                    progress(rows=report["rows"], total_rows=len(policies))
+
+            # Publish a new policy version so cached copies in the API processes get reloaded
+            version = policy_set_version({key: content_hash(value) for key, value in policies.items()})
+            publish_policy_version(cur, version)
+
+            cur.execute("COMMIT")
+            report["version"] = version
+            print(f"Data inserted into the table successfully. Policy version set to {version}.")
+
+            warehouse.policy_store.invalidate()
+
+    except Exception as e:
+        # The pool rolls the open transaction back before the session is reused
+        print(e)
+        report["rows"] = 0
+        report["error"] = str(e)
+
+    report["seconds"] = time.perf_counter() - start
+    if report["rows"] and report["seconds"]:
+        report["rows_per_second"] = report["rows"] / report["seconds"]
+    print(f"Uploaded {report['rows']} rows in {report['seconds']:.2f}s ({report['rows_per_second']:.1f} rows/sec)")
+
+    return report
+
+
+def iter_batches(iterable, batch_size):
+    # Yield lists of at most batch_size items without materializing the whole iterable
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def index_items(rows):
+    # (key, text) policy rows -> (id, text[, metadata]) items to embed for the current RETRIEVAL_MODE
+    if chunking.RETRIEVAL_MODE == "passage":
+        for chunk in chunking.chunk_policies(rows):
+            yield chunk["id"], chunk["text"], {"parent": chunk["parent"], "index": chunk["index"]}
+    else:
+        yield from rows
+
+
+def embed_and_upsert(model, store, rows, encode_batch_size, upsert_batch_size, progress=None):
+    # rows: iterable of (key, text). Only one upsert chunk of texts and vectors is held in memory.
+    total = 0
+    start = time.perf_counter()
+
+    for batch in iter_batches(index_items(rows), upsert_batch_size):
+        texts = [item[1] for item in batch]
+
+        vectors = model.encode(texts, batch_size=encode_batch_size)
+        store.upsert([(item[0], vector, *item[2:]) for item, vector in zip(batch, vectors.tolist())])
+
+        total += len(batch)
+        elapsed = time.perf_counter() - start
+        print(f"Upserted {total} vectors ({total / elapsed:.1f} vectors/sec)")
+        if progress:
+            progress(vectors=total)
+
+    return total
+
+
+def vectorize_policies(encode_batch_size=None, upsert_batch_size=None, progress=None):
+    # Mini-batch size for the encoder forward passes, and number of vectors per upsert call
+    encode_batch_size = encode_batch_size or int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    upsert_batch_size = upsert_batch_size or int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+
+    model = resources.get_model()
+
+    dimension = model.get_sentence_embedding_dimension()
+    print(dimension)
+
+    # Pinecone or the local NumPy index, depending on VECTOR_STORE
+    store = resources.get_vector_store()
+    store.ensure_index(dimension)
+
+    total = 0
+    start = time.perf_counter()
+    report = {}
+
+    try:
+        with snowflake_pool.cursor() as cur:
+            total = embed_and_upsert(model, store, iter_policies(cur, POLICY_TABLE), encode_batch_size, upsert_batch_size,
+                                     progress)
+
+    except Exception as e:
+        print(e)
+        report["error"] = str(e)
+
+    store.save()
+
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed else 0.0
+    print(f"All {total} text values have been vectorized and stored in the vector store in {elapsed:.2f}s ({rate:.1f} vectors/sec).")
+
+    report.update({"vectors": total, "seconds": elapsed, "vectors_per_second": rate})
+    return report
+
+
+def upload_policy_changes(upserts, removed, version):
+    # Replaces only the added/changed policies and deletes the removed ones, in one transaction.
+    # Unlike upload_policies_to_snowflake, errors are raised so a refresh can stop before
+    # recording the new state in its manifest.
+    with snowflake_pool.cursor() as cur:
+        create_policy_tables(cur)
+
+        cur.execute("BEGIN")
+
+        stale_keys = list(upserts) + list(removed)
+        for batch in iter_batches(stale_keys, INSERT_BATCH_ROWS):
+            placeholders = ", ".join(["%s"] * len(batch))
+            cur.execute(f"DELETE FROM {POLICY_TABLE} WHERE key IN ({placeholders})", batch)
+
+        insert_query = f"INSERT INTO {POLICY_TABLE} (key, value) VALUES (%s, %s)"
+        for batch in iter_insert_batches(upserts.items()):
+            cur.executemany(insert_query, batch)
+
+        publish_policy_version(cur, version)
+
+        cur.execute("COMMIT")
+
+    warehouse.policy_store.invalidate()
+    print(f"Uploaded {len(upserts)} policies and removed {len(removed)}. Policy version set to {version}.")
+
+
+def vectorize_policy_changes(upserts, removed, encode_batch_size=None, upsert_batch_size=None, previous_texts=None):
+    encode_batch_size = encode_batch_size or int(os.getenv("EMBED_BATCH_SIZE", "32"))
+    upsert_batch_size = upsert_batch_size or int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+
+    model = resources.get_model()
+    store = resources.get_vector_store()
+    store.ensure_index(model.get_sentence_embedding_dimension())
+
+    stale_ids = list(removed)
+    if chunking.RETRIEVAL_MODE == "passage":
+        # Old passages of changed or removed policies that the new text no longer produces
+        previous_texts = previous_texts or {}
+        new_ids = {chunk["id"] for chunk in chunking.chunk_policies(upserts.items())}
+        old_policies = [(key, previous_texts[key]) for key in list(upserts) + list(removed) if key in previous_texts]
+        stale_ids = [chunk["id"] for chunk in chunking.chunk_policies(old_policies) if chunk["id"] not in new_ids]
+
+    total = embed_and_upsert(model, store, upserts.items(), encode_batch_size, upsert_batch_size)
+    if stale_ids:
+        store.delete(stale_ids)
+    store.save()
+
+    return total
+
+
+def refresh_policies(filename="reddit_policies.csv", manifest_path=None):
+    # Incremental scrape -> upload -> vectorize: only what changed since the last refresh
+    manifest_path = manifest_path or os.getenv("POLICY_MANIFEST_PATH", "policy_manifest.json")
+    manifest = load_manifest(manifest_path)
+    previous_texts = read_policies_csv(filename) if os.path.exists(filename) else {}
+
+    # A 304 is only useful when the previous text is still at hand
+    validators = {key: entry for key, entry in manifest["policies"].items() if key in previous_texts}
+
+    content_dict, scrape_report = PolicyScraper().scrape(validators=validators)
+    if not content_dict:
+        print("Scrape returned no policies, keeping the current policy set.")
+        return {"version": manifest["version"], "scrape": scrape_report, "error": "scrape failed"}
+
+    pages = scrape_report["pages"]
+    for key, text in content_dict.items():
+        not_modified = text is None
+        failed = pages.get(key, {}).get("method") == "failed"
+        # Keep the previous text for unchanged pages, and for pages that failed this time
+        if (not_modified or failed) and key in previous_texts:
+            content_dict[key] = previous_texts[key]
+        elif not_modified:
+            content_dict[key] = CONTENT_NOT_FOUND
+
+    hashes = {key: content_hash(text) for key, text in content_dict.items()}
+    diff = diff_policies(manifest, hashes)
+    version = policy_set_version(hashes)
+
+    upserts = {key: content_dict[key] for key in diff["added"] + diff["changed"]}
+    print(f"Policies: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+          f"{len(diff['removed'])} removed, {len(diff['unchanged'])} unchanged")
+
+    if upserts or diff["removed"]:
+        upload_policy_changes(upserts, diff["removed"], version)
+        vectorize_policy_changes(upserts, diff["removed"], previous_texts=previous_texts)
+
+    # Writing to CSV
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=['key', 'value'])
+        writer.writeheader()
+        for key, value in content_dict.items():
+            writer.writerow({'key': key, 'value': value})
+
+    save_manifest({
+        "version": version,
+        "policies": {
+            key: {
+                "sha256": hashes[key],
+                "url": pages.get(key, {}).get("url"),
+                "etag": pages.get(key, {}).get("etag"),
+                "last_modified": pages.get(key, {}).get("last_modified"),
+            }
+            for key in content_dict
+        },
+    }, manifest_path)
+
+    return {
+        "version": version,
+        "added": diff["added"],
+        "changed": diff["changed"],
+        "removed": diff["removed"],
+        "unchanged": len(diff["unchanged"]),
+        "scrape": scrape_report,
+    }
@@ -0,0 +1,288 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+# Background jobs for the long-running policy admin endpoints (scrape, upload, vectorize,
+# refresh). Submitting returns a job id straight away; the work runs in a small executor and
+# records its state, progress and stage timings in a SQLite job table, so status survives a
+# restart. Several API workers share the table: each active job is owned by the process running
+# it, which keeps its heartbeat fresh. A job whose owner stopped heartbeating (the process died
+# or was restarted) is claimed and run again by another runner (every policy job replaces its
+# output, so re-running is safe).
+# Submitting a job while one with the same name is queued or running returns the existing job.
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".safefeed", "jobs.sqlite3")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Progress updates are written to the job table at most this often
+PROGRESS_WRITE_INTERVAL = 1.0
+
+# Owners refresh the heartbeat of their active jobs this often, and look for stale jobs to claim;
+# a job whose heartbeat is older than JOB_STALE_AFTER is considered abandoned
+HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+JOB_COLUMNS = "id, name, state, attempts, progress, stages, result, error, submitted_at, started_at, finished_at"
+
+ACTIVE_PLACEHOLDERS = ", ".join("?" for _ in ACTIVE_STATES)
+
+
+class UnknownJob(Exception):
+    pass
+
+
+class JobContext:
+    # Handed to the job function so it can report progress and time its stages
+
+    def __init__(self, runner, job_id):
+        self.runner = runner
+        self.job_id = job_id
+        self.progress_fields = {}
+        self.stages = []
+        self._written_at = 0.0
+
+    def progress(self, **fields):
+        self.progress_fields.update(fields)
+        now = time.time()
+        if now - self._written_at >= PROGRESS_WRITE_INTERVAL:
+            self._written_at = now
+            self.runner._update(self.job_id, progress=self.progress_fields)
+
+    @contextmanager
+    def stage(self, name):
+        stage = {"name": name, "started_at": time.time(), "seconds": None}
+        self.stages.append(stage)
+        self.runner._update(self.job_id, stages=self.stages)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stage["seconds"] = time.perf_counter() - start
+            self.runner._update(self.job_id, stages=self.stages, progress=self.progress_fields)
+
+
+class JobRunner:
+
+    def __init__(self, path=None, max_workers=None, heartbeat_interval=None, stale_after=None):
+        self.path = path if path is not None else os.getenv("JOB_DB_PATH", DEFAULT_PATH)
+        self.max_workers = max_workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.heartbeat_interval = heartbeat_interval or HEARTBEAT_INTERVAL
+        self.stale_after = stale_after or STALE_AFTER
+        # Unique per runner, so a restarted worker never mistakes its predecessor's jobs for its own
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._stopped = threading.Event()
+        self._claiming = False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One connection per process, guarded by self._lock
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                state TEXT,
+                attempts INTEGER,
+                progress TEXT,
+                stages TEXT,
+                result TEXT,
+                error TEXT,
+                submitted_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                heartbeat REAL
+            )
+        """)
+        # Job tables created before jobs had owners
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # a sibling worker added it first
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_name_state ON jobs (name, state)")
+
+        threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+    def register(self, name, func):
+        # func(job) -> JSON-serializable result; job is a JobContext
+        self._functions[name] = func
+
+    def _update(self, job_id, **fields):
+        columns = []
+        values = []
+        for column, value in fields.items():
+            if column in ("progress", "stages", "result"):
+                value = json.dumps(value, default=str)
+            columns.append(f"{column} = ?")
+            values.append(value)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(columns)} WHERE id = ?", (*values, job_id))
+
+    def submit(self, name):
+        # Returns (job, coalesced)
+        if name not in self._functions:
+            raise UnknownJob(name)
+
+        with self._lock:
+            # Check and insert in one write transaction, so API workers sharing the job table
+            # can't both start the same job
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE name = ? AND state IN ({ACTIVE_PLACEHOLDERS}) "
+                    "ORDER BY submitted_at LIMIT 1",
+                    (name, *ACTIVE_STATES)
+                ).fetchone()
+                if row is not None:
+                    job_id, coalesced = row[0], True
+                else:
+                    job_id, coalesced = uuid.uuid4().hex, False
+                    now = time.time()
+                    self._conn.execute(
+                        "INSERT INTO jobs (id, name, state, attempts, progress, stages, submitted_at, owner, heartbeat) "
+                        "VALUES (?, ?, ?, 0, '{}', '[]', ?, ?, ?)",
+                        (job_id, name, QUEUED, now, self.owner, now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if not coalesced:
+            self._executor.submit(self._run, job_id, name)
+        return self.get(job_id), coalesced
+
+    def _run(self, job_id, name):
+        job = JobContext(self, job_id)
+        with self._lock:
+            now = time.time()
+            claimed = self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, started_at = ?, error = NULL, "
+                "progress = '{}', stages = '[]', heartbeat = ? WHERE id = ? AND state = ? AND owner = ?",
+                (RUNNING, now, now, job_id, QUEUED, self.owner)
+            ).rowcount
+        if not claimed:
+            # Another runner took the job over while it waited in this executor
+            return
+
+        try:
+            result = self._functions[name](job)
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, state=FAILED, error=str(e) or type(e).__name__, progress=job.progress_fields,
+                         finished_at=time.time())
+            return
+
+        # The policy functions report their own errors in the result instead of raising
+        error = result.get("error") if isinstance(result, dict) else None
+        self._update(job_id, state=FAILED if error else SUCCEEDED, result=result, error=error,
+                     progress=job.progress_fields, finished_at=time.time())
+
+    def claim_stale(self):
+        # Re-run active jobs whose owner stopped heartbeating. Each claim is a compare-and-set on
+        # the state and heartbeat the runner saw, so of several runners only one gets each job,
+        # and a job whose owner is still alive is never taken.
+        now = time.time()
+        cutoff = now - self.stale_after
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, name, state, heartbeat FROM jobs WHERE state IN ({ACTIVE_PLACEHOLDERS}) "
+                "AND (heartbeat IS NULL OR heartbeat < ?) ORDER BY submitted_at",
+                (*ACTIVE_STATES, cutoff)
+            ).fetchall()
+
+            claimed = []
+            for job_id, name, state, heartbeat in rows:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET state = ?, owner = ?, heartbeat = ? "
+                    "WHERE id = ? AND state = ? AND heartbeat IS ?",
+                    (QUEUED, self.owner, now, job_id, state, heartbeat)
+                )
+                if cursor.rowcount:
+                    claimed.append((job_id, name))
+
+        resumed = []
+        for job_id, name in claimed:
+            if name in self._functions:
+                self._executor.submit(self._run, job_id, name)
+                resumed.append(job_id)
+            else:
+                self._update(job_id, state=FAILED, error=f"Unknown job '{name}'", finished_at=time.time())
+        if resumed:
+            print(f"Resumed {len(resumed)} interrupted jobs")
+        return resumed
+
+    def _heartbeat_loop(self):
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        f"UPDATE jobs SET heartbeat = ? WHERE owner = ? AND state IN ({ACTIVE_PLACEHOLDERS})",
+                        (time.time(), self.owner, *ACTIVE_STATES)
+                    )
+                # Take over the jobs of a worker that died while this one keeps running
+                if self._claiming:
+                    self.claim_stale()
+            except Exception:
+                traceback.print_exc()
+
+    def resume(self):
+        # Called once at startup, after the job functions are registered: re-run jobs that a
+        # stopped process left queued or running, now and whenever a worker dies later on.
+        # Jobs owned by a live sibling worker are left alone.
+        self._claiming = True
+        return self.claim_stale()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _row_to_job(self, row):
+        job_id, name, state, attempts, progress, stages, result, error, submitted_at, started_at, finished_at = row
+        stages = json.loads(stages or "[]")
+        return {
+            "job_id": job_id,
+            "name": name,
+            "state": state,
+            "attempts": attempts,
+            "progress": json.loads(progress or "{}"),
+            "stages": stages,
+            "current_stage": stages[-1]["name"] if stages and state == RUNNING else None,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "submitted_at": submitted_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise UnknownJob(job_id)
+        return self._row_to_job(row)
+
+    def list(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs ORDER BY submitted_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
@@ -1,61 +1,250 @@
 import os
-import sqlite3
+import threading
 from fastapi import FastAPI, Response
 from dotenv import load_dotenv
-import boto3
-import base_model
-import basic_func
-import pandas as pd
-import streamlit as st
-from passlib.context import CryptContext
-from fastapi import Depends, FastAPI, HTTPException, status
+import jobs
+import metrics
+import resources
+import serving
+import warehouse
+from fastapi import HTTPException, status
 from pydantic import BaseModel
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
 import json
-from datetime import datetime, timedelta
-import io
 from fastapi.responses import StreamingResponse
 
 
+# Only the serving path is imported at startup. The encoder, torch and the OpenAI client are
+# loaded by the background warm-up, and the scraping / ingestion modules by the admin jobs that
+# use them, so the process answers /health/live almost immediately.
+
+
 app =FastAPI()
 
 load_dotenv()
 
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
 
 
-@app.post("/scrape-reddit-policies", tags=["Reddit Policies"])
-async def scrape_reddit_policies_f() -> dict:
 
-    basic_func.scrape_reddit_policies()
+@app.on_event("startup")
+async def load_resources():
+    # Load the encoder and the index handle once for the whole process. This runs in the
+    # background so /health/live answers straight away while /health/ready reports 503.
+    threading.Thread(target=resources.warm_up, args=(warehouse.policy_store.refresh,), daemon=True).start()
 
-    return {"output" : "Successfully Scraped!"}
+    # Jobs that were queued or running when the server last stopped
+    job_runner.resume()
 
 
 
-@app.post("/upload-policies-to-snowflake", tags=["Reddit Policies"])
-async def upload_policies_to_snowflake_f() -> dict:
+@app.get("/health/live", tags=["Health"])
+async def live_f() -> dict:
+
+    return {"status" : "alive"}
+
+
+
+@app.get("/health/ready", tags=["Health"])
+async def ready_f(response: Response) -> dict:
+
+    # The load balancer should only route traffic here once warm-up has finished
+    if not resources.is_ready():
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return resources.stats()
+
+
+
+@app.get("/metrics", tags=["Health"])
+async def metrics_f() -> Response:
+
+    # Prometheus scrape endpoint
+    body, content_type = metrics.render()
+
+    return Response(content=body, media_type=content_type)
+
+
+
+@app.get("/verdict-cache/stats", tags=["Health"])
+async def verdict_cache_stats_f() -> dict:
+
+    return resources.get_verdict_cache().stats()
+
+
+
+@app.get("/single-flight/stats", tags=["Health"])
+async def single_flight_stats_f() -> dict:
+
+    # Requests that shared an identical in-flight moderation instead of starting their own
+    return serving.single_flight_stats()
+
+
+
+@app.get("/snowflake-pool/stats", tags=["Health"])
+async def snowflake_pool_stats_f() -> dict:
+
+    return warehouse.snowflake_pool.stats()
+
+
+
+# Policy admin work runs as background jobs; the endpoints only submit and report status
+job_runner = jobs.JobRunner()
+
+
+def scrape_job(job):
+    import scraping
+
+    with job.stage("scrape"):
+        report = scraping.scrape_reddit_policies()
+    job.progress(pages=len(report["pages"]))
+    return report
+
+
+def upload_job(job):
+    import ingestion
+
+    with job.stage("upload"):
+        return ingestion.upload_policies_to_snowflake(progress=job.progress)
+
+
+def vectorize_job(job):
+    import ingestion
+
+    with job.stage("vectorize"):
+        return ingestion.vectorize_policies(progress=job.progress)
+
+
+def refresh_job(job):
+    import ingestion
+
+    with job.stage("refresh"):
+        return ingestion.refresh_policies()
+
 
-    basic_func.upload_policies_to_snowflake()
+job_runner.register("scrape-reddit-policies", scrape_job)
+job_runner.register("upload-policies-to-snowflake", upload_job)
+job_runner.register("vectorize-policies", vectorize_job)
+job_runner.register("refresh-policies", refresh_job)
 
-    return {"output" : "Successfully Uploaded!"}
+
+# Jobs that write the vector index, which is read-only while it comes from a policy snapshot
+INDEX_JOBS = {"vectorize-policies", "refresh-policies"}
+
+
+def submit_job(name, response):
+    if name in INDEX_JOBS and os.getenv("POLICY_SNAPSHOT"):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="POLICY_SNAPSHOT is set, so the vector index is read-only; "
+                                   "build a new snapshot with snapshot.py build instead")
+
+    # A job that is already queued or running is returned instead of starting a second one
+    job, coalesced = job_runner.submit(name)
+    response.status_code = status.HTTP_202_ACCEPTED
+
+    return {"output" : "Job already running" if coalesced else "Job submitted", "job" : job, "coalesced" : coalesced}
+
+
+
+@app.post("/scrape-reddit-policies", tags=["Reddit Policies"])
+async def scrape_reddit_policies_f(response: Response) -> dict:
+
+    return submit_job("scrape-reddit-policies", response)
+
+
+
+@app.post("/upload-policies-to-snowflake", tags=["Reddit Policies"])
+async def upload_policies_to_snowflake_f(response: Response) -> dict:
+
+    return submit_job("upload-policies-to-snowflake", response)
 
 
 
 @app.post("/vectorize-policies", tags=["Reddit Policies"])
-async def vectorize_policies_f() -> dict:
+async def vectorize_policies_f(response: Response) -> dict:
+
+    return submit_job("vectorize-policies", response)
+
+
+
+@app.post("/refresh-policies", tags=["Reddit Policies"])
+async def refresh_policies_f(response: Response) -> dict:
+
+    # Scrape, upload and re-embed only the policies that changed since the last refresh
+    return submit_job("refresh-policies", response)
+
 
-    basic_func.vectorize_policies()
 
-    return {"output" : "Successfully Uploaded!"}
+@app.get("/jobs", tags=["Jobs"])
+async def jobs_f(limit: int = 20) -> dict:
+
+    return {"jobs" : job_runner.list(limit)}
+
+
+
+@app.get("/jobs/{job_id}", tags=["Jobs"])
+async def job_f(job_id: str) -> dict:
+
+    try:
+        return job_runner.get(job_id)
+    except jobs.UnknownJob:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job '{job_id}'")
 
 
 
 @app.post("/llm-response", tags=["Reddit Policies"])
 async def llm_response_f(text: str) -> dict:
 
-    policies = basic_func.similarity_search(text)
+    # Embedding, retrieval and the completion are awaited, so requests overlap on the event loop
+    try:
+        generated_response = await serving.moderate(text)
+    except serving.UpstreamTimeout as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+
+    return {"generated_response" : generated_response}
+
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+
+@app.post("/llm-response/stream", tags=["Reddit Policies"])
+async def llm_response_stream_f(text: str) -> StreamingResponse:
+
+    # Server-sent events: "verdict" (policy_violation true/false) as soon as it is generated,
+    # "token" for every completion chunk, then "done" with the full response, or "error".
+    # The 200 is sent before the stream can fail, so a failure is reported to the metrics directly.
+    async def events():
+        try:
+            async for event, data in serving.moderate_stream(text):
+                yield sse_event(event, data)
+        except serving.UpstreamTimeout as e:
+            metrics.set_outcome("timeout")
+            yield sse_event("error", {"detail" : str(e), "status_code" : status.HTTP_504_GATEWAY_TIMEOUT})
+        except Exception as e:
+            metrics.set_outcome("error")
+            yield sse_event("error", {"detail" : str(e) or type(e).__name__, "status_code" : status.HTTP_502_BAD_GATEWAY})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control" : "no-cache"})
+
+
+
+class BatchModerationRequest(BaseModel):
+    posts: list[str]
+
+
+
+@app.post("/llm-response/batch", tags=["Reddit Policies"])
+async def llm_response_batch_f(request: BatchModerationRequest) -> dict:
+
+    if len(request.posts) > serving.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {serving.MAX_BATCH_SIZE} posts per batch"
+        )
 
-    generated_response = basic_func.check_policies(text, policies)
+    # Results come back in input order, each with its own error field
+    results = await serving.moderate_batch(request.posts)
 
-    return {"generated_response" : generated_response}
\ No newline at end of file
+    return {"results" : results}
\ No newline at end of file
@@ -0,0 +1,169 @@
+import time
+from contextvars import ContextVar
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+
+# Prometheus metrics for the API, exposed on /metrics.
+#   safefeed_http_requests_total{endpoint, outcome}     requests by outcome (ok, client_error, timeout, error);
+#                                                       a streamed response counts by how its stream ended
+#   safefeed_http_request_seconds{endpoint}             time until the response is fully sent
+#   safefeed_http_requests_in_flight{endpoint}          requests being handled right now
+#   safefeed_stage_seconds{stage}                       encode, vector_query, policy_lookup, verdict_cache, completion,
+#                                                       completion_verdict / completion_stream (streamed, after the first byte)
+#   safefeed_stage_in_flight{stage}                     calls waiting on each stage right now
+#   safefeed_stage_timeouts_total{stage}
+#   safefeed_cache_requests_total{cache, result}        hit / miss
+#   safefeed_single_flight_total{result}                leader / coalesced (joined an identical request)
+# Endpoints are labelled by route template, so label cardinality stays fixed. Label children are
+# created once and reused, which keeps the cost per observation to a lock and a few additions.
+
+# Request stages range from a few ms (cache, encode) to tens of seconds (completion)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REQUESTS = Counter("safefeed_http_requests_total", "HTTP requests by outcome", ["endpoint", "outcome"])
+REQUEST_SECONDS = Histogram("safefeed_http_request_seconds", "HTTP request latency", ["endpoint"],
+                            buckets=LATENCY_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge("safefeed_http_requests_in_flight", "HTTP requests being handled", ["endpoint"])
+
+STAGE_SECONDS = Histogram("safefeed_stage_seconds", "Latency of each step of a moderation request", ["stage"],
+                          buckets=LATENCY_BUCKETS)
+STAGE_IN_FLIGHT = Gauge("safefeed_stage_in_flight", "Calls currently waiting on each stage", ["stage"])
+STAGE_TIMEOUTS = Counter("safefeed_stage_timeouts_total", "Stage calls that hit their timeout", ["stage"])
+
+CACHE_REQUESTS = Counter("safefeed_cache_requests_total", "Cache lookups by result", ["cache", "result"])
+SINGLE_FLIGHT = Counter("safefeed_single_flight_total",
+                        "Moderation computations started (leader) or joined while in flight (coalesced)", ["result"])
+
+_children = {}
+
+# Outcome a streamed response reports after its 200 has been sent (see set_outcome)
+_outcome_override = ContextVar("outcome_override", default=None)
+
+# Called with (stage, seconds) for every stage observation, e.g. to keep the raw samples the
+# histograms bucket away (bench_suite.py computes exact percentiles from them)
+_stage_listeners = []
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+def stage_label(stage):
+    return stage.replace(" ", "_")
+
+
+def add_stage_listener(listener):
+    _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener):
+    _stage_listeners.remove(listener)
+
+
+def _observe(stage, seconds):
+    _child(STAGE_SECONDS, stage).observe(seconds)
+    for listener in _stage_listeners:
+        listener(stage, seconds)
+
+
+@contextmanager
+def track_stage(stage):
+    stage = stage_label(stage)
+    in_flight = _child(STAGE_IN_FLIGHT, stage)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe(stage, time.perf_counter() - start)
+        in_flight.dec()
+
+
+def observe_stage(stage, seconds):
+    _observe(stage_label(stage), seconds)
+
+
+def stage_timeout(stage):
+    _child(STAGE_TIMEOUTS, stage_label(stage)).inc()
+
+
+def cache_result(cache, hit):
+    _child(CACHE_REQUESTS, cache, "hit" if hit else "miss").inc()
+
+
+def single_flight_result(coalesced):
+    _child(SINGLE_FLIGHT, "coalesced" if coalesced else "leader").inc()
+
+
+def outcome(status_code):
+    if status_code == 504:
+        return "timeout"
+    if status_code >= 500:
+        return "error"
+    if status_code >= 400:
+        return "client_error"
+    return "ok"
+
+
+def set_outcome(value):
+    # Overrides the status-derived outcome of the current request. StreamingResponse iterates the
+    # body in a child task, which sees a copy of the context, so the middleware hands down a dict
+    # rather than reading the variable back.
+    override = _outcome_override.get()
+    if override is not None:
+        override["outcome"] = value
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def route_template(routes, scope):
+    # Same matching the router does, so a request is labelled by e.g. /jobs/{job_id} rather than
+    # by its raw path
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: counts every HTTP request once the response body has been sent
+    # (streamed responses included), without buffering anything
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        endpoint = route_template(self.routes, scope)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        override = {}
+        token = _outcome_override.set(override)
+        in_flight = _child(REQUESTS_IN_FLIGHT, endpoint)
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _outcome_override.reset(token)
+            in_flight.dec()
+            _child(REQUESTS, endpoint, override.get("outcome") or outcome(status_code)).inc()
+            _child(REQUEST_SECONDS, endpoint).observe(time.perf_counter() - start)
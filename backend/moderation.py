@@ -0,0 +1,131 @@
+import re
+import chunking
+import resources
+import warehouse
+
+
+# Blocking moderation path: retrieve the policies closest to a post and ask the completion model
+# for a verdict. Also holds the prompt and verdict format shared with the async path in serving.py.
+
+
+def similarity_search(text):
+    # The encoder and the vector store are process-wide, loaded once at startup
+    store = resources.get_vector_store()
+    policy_store = warehouse.policy_store
+
+    query_vector = resources.encode(text)
+
+    if chunking.RETRIEVAL_MODE == "passage":
+        # Best passages that fit in PROMPT_TOKEN_BUDGET, grouped by policy
+        matches = store.query(query_vector, top_k=chunking.PASSAGE_TOP_K)
+        passages = policy_store.get_passages([match['id'] for match in matches])
+        values_dict = chunking.assemble_passages(matches, passages)
+    else:
+        matches = store.query(query_vector, top_k=6)
+
+        for match in matches:
+            print(f"ID: {match['id']}, Score: {match['score']}")
+
+        match_ids = [match['id'] for match in matches]
+
+        # Policy text is served from the in-process copy of REDDIT_POLICIES, no warehouse round trip
+        values_dict = policy_store.get(match_ids)
+
+    # Printing the values dictionary
+    for key, value in values_dict.items():
+        print(f"Key: {key}, Value: {value}")
+
+    return values_dict
+
+
+
+# Completion settings shared by the blocking and the async moderation paths
+COMPLETION_PARAMS = {
+    "model": "gpt-3.5-turbo-instruct",
+    "temperature": 1,
+    "max_tokens": 256,
+    "top_p": 1,
+    "frequency_penalty": 0,
+    "presence_penalty": 0,
+}
+
+
+def build_prompt(text, policies):
+    # Combine all policies into a single string
+    policies_text = "\n".join([f"{key}: {value}" for key, value in policies.items()])
+    prompt = f"""You are an AI model named SafeFeed, created to strictly analyze social media posts and determine if they violate a given platform's policies.
+    
+Platform Policies:
+{policies_text}
+
+Post Title and Text: "{text}"
+
+Your responses should follow this format:
+
+Policy Violation: [True/False]
+Reason: [Detailed explanation if the post violates the policies, otherwise leave blank]
+
+Strictly respond with either "True" or "False" to indicate if the post violates the platform's policies. If "True", provide a detailed "Reason" explaining how the post violates the policies. If "False", leave the "Reason" field blank.
+
+Remember to be concise and objective in your analysis, focusing solely on whether the post adheres to or violates the platform's policies.
+"""
+
+    return prompt
+
+
+# "Policy Violation: True" / "Policy Violation: False" line of a completion, brackets optional
+VERDICT_PATTERN = re.compile(r"Policy Violation:\s*\[?\s*(True|False)\b", re.IGNORECASE)
+
+
+def parse_verdict(generated_response):
+    # True / False once the verdict line has been generated, None until then
+    match = VERDICT_PATTERN.search(generated_response)
+    if match is None:
+        return None
+    return match.group(1).lower() == "true"
+
+
+# Verdict cache namespace for check_policies completions
+VERDICT_NAMESPACE = "check_policies"
+
+
+def cached_verdict(text):
+    # The same text against the same policy version gets the same verdict
+    return resources.get_verdict_cache().get(VERDICT_NAMESPACE, text, warehouse.policy_store.version)
+
+
+def moderate(text):
+    # Looks the verdict up before retrieval, so a cached text costs no encode or vector query
+    cached_response = cached_verdict(text)
+    if cached_response is not None:
+        return cached_response
+
+    return complete(text, similarity_search(text))
+
+
+def check_policies(text, policies):
+    cached_response = cached_verdict(text)
+    if cached_response is not None:
+        return cached_response
+
+    return complete(text, policies)
+
+
+def complete(text, policies):
+    cache = resources.get_verdict_cache()
+    policy_store = warehouse.policy_store
+
+    # Process-wide OpenAI client, reads OPENAI_API_KEY from the environment
+    client = resources.get_openai()
+
+    prompt = build_prompt(text, policies)
+
+    response = client.completions.create(prompt=prompt, **COMPLETION_PARAMS)
+    
+    print(response)
+
+    generated_response = response.choices[0].text
+
+    cache.set(VERDICT_NAMESPACE, text, policy_store.version, generated_response)
+
+    return (generated_response)
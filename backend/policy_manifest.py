@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+
+
+# Record of what was last published for each policy key: content hash plus the HTTP validators
+# (ETag / Last-Modified) of the page it came from. A refresh diffs the freshly scraped policies
+# against it, so only added or changed policies are uploaded and re-embedded and removed ones are
+# deleted. The policy set version is derived from the content hashes, so it only changes when a
+# policy actually changes and downstream caches can key on it.
+
+DEFAULT_PATH = "policy_manifest.json"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def policy_set_version(hashes):
+    # hashes: {key: content hash}
+    digest = hashlib.sha256()
+    for key in sorted(hashes):
+        digest.update(f"{key}\0{hashes[key]}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def load_manifest(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return {"version": None, "policies": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=DEFAULT_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def diff_policies(manifest, hashes):
+    # Compare {key: content hash} against the manifest
+    previous = {key: entry["sha256"] for key, entry in manifest["policies"].items()}
+
+    added = [key for key in hashes if key not in previous]
+    changed = [key for key in hashes if key in previous and previous[key] != hashes[key]]
+    removed = [key for key in previous if key not in hashes]
+    unchanged = [key for key in hashes if previous.get(key) == hashes[key]]
+
+    return {"added": added, "changed": changed, "removed": removed, "unchanged": unchanged}
@@ -0,0 +1,329 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Scraper for the Reddit content policy and the policy pages it links to.
+# Pages are fetched concurrently over one pooled HTTP session. Only a page whose article body is
+# missing from the raw HTML (i.e. it needs JavaScript) is loaded in a headless browser, taken from
+# a small pool of reused instances that wait for the article to appear instead of sleeping.
+
+CONTENT_POLICY_URL = "https://www.redditinc.com/policies/content-policy"
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+ARTICLE_SELECTOR = "div.lt-article__body"
+CONTENT_NOT_FOUND = "Content division not found."
+
+
+def parse_index(html):
+    # Returns the links in the content policy ({link text: href}) and the policy text itself
+    soup = BeautifulSoup(html, 'html.parser')
+    href_dict = {}
+    formatted_content = ""
+
+    content_div = soup.find('div', id='content')
+    if content_div:
+        for link in content_div.find_all('a'):
+            if link.text and link.get('href'):
+                href_dict[link.text.strip()] = link.get('href').strip()
+
+        for child in content_div.descendants:
+            if child.name in ['h1', 'h2', 'h3', 'p', 'li']:
+                formatted_content += child.text  # Headings, paragraphs and list items
+    else:
+        print("Div with id 'content' not found.")
+
+    return href_dict, formatted_content
+
+
+def parse_article(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    article_body = soup.select_one(ARTICLE_SELECTOR)
+    if article_body:
+        return article_body.get_text(separator=' ', strip=True)
+    return None
+
+
+def make_session(pool_size):
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fixture_fetcher(directory):
+    # Serves saved pages from a local directory instead of the network, for offline runs.
+    # A URL maps to <last path segment>.html, and the content policy itself to index.html.
+    def fetch(url):
+        if url == CONTENT_POLICY_URL:
+            name = "index"
+        else:
+            name = urlparse(url).path.rstrip('/').split('/')[-1] or "index"
+        path = os.path.join(directory, f"{name}.html")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    return fetch
+
+
+class BrowserPoolTimeout(Exception):
+    pass
+
+
+class BrowserPool:
+
+    def __init__(self, size=2, wait_timeout=15, acquire_timeout=60):
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self.acquire_timeout = acquire_timeout
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = 0  # open drivers, idle or borrowed
+        self._driver_path = None
+
+    def _create_driver(self):
+        # Selenium is only needed when a page actually requires a browser
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        if self._driver_path is None:
+            self._driver_path = ChromeDriverManager().install()
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument(f"user-agent={HEADERS['User-Agent']}")
+        return webdriver.Chrome(service=Service(self._driver_path), options=options)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._created < self.size:
+                    # Reserve a slot, then start the browser without holding the lock
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BrowserPoolTimeout(f"No browser available after {self.acquire_timeout:.0f}s")
+                self._cond.wait(remaining)
+
+        try:
+            return self._create_driver()
+        except Exception:
+            # Give the slot back, or later callers would wait for a browser that never comes
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing browser: {e}")
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def driver(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        except Exception:
+            # A browser that errored may be wedged; start a fresh one instead of reusing it
+            self._discard(driver)
+            raise
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    def fetch(self, url):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.driver() as driver:
+            driver.get(url)
+            try:
+                # Wait until the article is rendered rather than for a fixed delay
+                WebDriverWait(driver, self.wait_timeout).until(
+                    expected_conditions.presence_of_element_located((By.CSS_SELECTOR, ARTICLE_SELECTOR))
+                )
+            except TimeoutException:
+                pass
+            return driver.page_source
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+
+class PolicyScraper:
+
+    def __init__(self, fetch_html=None, max_workers=8, max_per_host=4, browser_pool_size=2, use_browser=True):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.session = make_session(max_workers)
+        self.fetch_html = fetch_html
+        self.browser_pool = BrowserPool(size=browser_pool_size) if use_browser else None
+
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def fetch(self, url, validators=None):
+        # Returns {'html', 'etag', 'last_modified', 'not_modified'}. validators holds the ETag /
+        # Last-Modified of the previous fetch; an unchanged page then costs a bodyless 304.
+        if self.fetch_html is not None:
+            return {"html": self.fetch_html(url), "etag": None, "last_modified": None, "not_modified": False}
+
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        with self._host_limit(url):
+            response = self.session.get(url, headers=headers, timeout=15)
+
+        result = {
+            "html": None,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "not_modified": response.status_code == 304,
+        }
+        if response.status_code == 200:
+            result["html"] = response.text
+        elif not result["not_modified"]:
+            print(f"Failed to fetch {url}, status code: {response.status_code}")
+        return result
+
+    def scrape_page(self, key, url, validators=None):
+        start = time.perf_counter()
+        method = "http"
+        text = None
+        fetched = {"etag": None, "last_modified": None}
+
+        try:
+            fetched = self.fetch(url, validators)
+            if fetched["not_modified"]:
+                print(f"{key}: Not modified.")
+                # No text: the caller keeps the copy it already has
+                return key, None, {"url": url, "method": "not_modified", "seconds": time.perf_counter() - start,
+                                   "etag": validators.get("etag"), "last_modified": validators.get("last_modified")}
+            text = parse_article(fetched["html"]) if fetched["html"] else None
+        except requests.RequestException as e:
+            print(f"{key}: HTTP fetch failed: {e}")
+
+        if text is None and self.browser_pool is not None:
+            method = "browser"
+            try:
+                text = parse_article(self.browser_pool.fetch(url))
+            except Exception as e:
+                print(f"{key}: browser fetch failed: {e}")
+
+        if text is None:
+            method = "failed"
+            text = CONTENT_NOT_FOUND
+            print(f"{key}: Content division not found.")
+        else:
+            print(f"{key}: Content extracted ({method}).")
+
+        page_report = {"url": url, "method": method, "seconds": time.perf_counter() - start}
+        if method == "http":
+            # Validators only describe the HTTP response, not what a browser rendered
+            page_report["etag"] = fetched["etag"]
+            page_report["last_modified"] = fetched["last_modified"]
+        return key, text, page_report
+
+    def scrape(self, index_url=CONTENT_POLICY_URL, validators=None):
+        # validators: {key: {'etag', 'last_modified'}} from the previous run. Pages that answer
+        # 304 Not Modified come back with a None text.
+        validators = validators or {}
+        start = time.perf_counter()
+        content_dict = {}
+        pages = {}
+
+        try:
+            index_html = self.fetch(index_url)["html"]
+        except requests.RequestException as e:
+            print(f"Failed to fetch the webpage: {e}")
+            index_html = None
+        if index_html is None:
+            print(f"Failed to fetch the webpage: {index_url}")
+            return content_dict, {"seconds": time.perf_counter() - start, "pages": pages}
+
+        href_dict, home_content = parse_index(index_html)
+        content_dict['home'] = home_content
+
+        for name, href in href_dict.items():
+            print(f"{name}: {href}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(lambda item: self.scrape_page(item[0], item[1], validators.get(item[0])),
+                                       href_dict.items())
+                # map keeps the link order of the content policy page
+                for key, text, page_report in results:
+                    content_dict[key] = text
+                    pages[key] = page_report
+        finally:
+            if self.browser_pool is not None:
+                self.browser_pool.close()
+
+        elapsed = time.perf_counter() - start
+        methods = [page["method"] for page in pages.values()]
+        report = {
+            "seconds": elapsed,
+            "pages": pages,
+            "http": methods.count("http"),
+            "browser": methods.count("browser"),
+            "failed": methods.count("failed"),
+            "not_modified": methods.count("not_modified"),
+        }
+        print(f"Scraped {len(pages)} policy pages in {elapsed:.2f}s "
+              f"({report['http']} over HTTP, {report['browser']} in a browser, "
+              f"{report['not_modified']} not modified, {report['failed']} failed)")
+
+        return content_dict, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the Reddit content policy pages")
+    parser.add_argument("--fixtures", help="directory of saved HTML pages to scrape instead of the network")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    fetch_html = fixture_fetcher(args.fixtures) if args.fixtures else None
+    scraper = PolicyScraper(fetch_html=fetch_html, max_workers=args.workers, max_per_host=args.per_host,
+                            use_browser=not args.fixtures)
+    content, report = scraper.scrape()
+    for name, text in content.items():
+        print(f"{name}: {text[:80]}")
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from chunking import chunk_policies
+
+
+# In-process copy of the REDDIT_POLICIES table.
+# The table is small and changes only when upload_policies_to_snowflake runs, so it is loaded
+# once and then served from memory. Every POLICY_CACHE_TTL seconds a single request checks the
+# version marker written by the upload (a one-row query) and reloads the table only if it changed.
+
+DEFAULT_TTL_SECONDS = 300
+
+
+class PolicyStore:
+
+    def __init__(self, load_policies, load_version, ttl=None):
+        # load_policies() -> {key: value}, load_version() -> version id or None
+        self._load_policies = load_policies
+        self._load_version = load_version
+        self.ttl = ttl if ttl is not None else float(os.getenv("POLICY_CACHE_TTL", DEFAULT_TTL_SECONDS))
+
+        self._lock = threading.Lock()
+        self._policies = None
+        self._passages = None
+        self.version = None
+        self._checked_at = 0.0
+        self._stale = False
+
+        self.loads = 0
+        self.version_checks = 0
+
+    def _reload(self, version):
+        start = time.perf_counter()
+        self._policies = self._load_policies()
+        self._passages = None
+        self.version = version
+        self._stale = False
+        self.loads += 1
+        print(f"Loaded {len(self._policies)} policies (version {version}) in {time.perf_counter() - start:.2f}s")
+
+    def refresh(self, force=False):
+        with self._lock:
+            version = self._load_version()
+            self.version_checks += 1
+            if force or self._stale or self._policies is None or version != self.version:
+                self._reload(version)
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        # The next read reloads the table; until then the current copy keeps being served
+        self._stale = True
+        self._checked_at = float("-inf")
+
+    def _ensure_fresh(self):
+        if self._policies is None:
+            with self._lock:
+                # Concurrent first requests wait for a single load
+                if self._policies is None:
+                    self._reload(self._load_version())
+                    self._checked_at = time.monotonic()
+            return
+
+        if time.monotonic() - self._checked_at < self.ttl:
+            return
+
+        # Only one request pays for the version check; the others keep serving the current copy
+        if self._lock.acquire(blocking=False):
+            try:
+                version = self._load_version()
+                self.version_checks += 1
+                if self._stale or version != self.version:
+                    self._reload(version)
+                self._checked_at = time.monotonic()
+            except Exception as e:
+                print(f"Policy version check failed, serving cached policies: {e}")
+            finally:
+                self._lock.release()
+
+    def get(self, keys):
+        self._ensure_fresh()
+        policies = self._policies
+        return {key: policies[key] for key in keys if key in policies}
+
+    def get_passages(self, passage_ids):
+        # Passages are rebuilt from the cached policy text, chunked the same way vectorize_policies
+        # chunks them, so the vector index only has to store passage ids
+        self._ensure_fresh()
+        policies, cached = self._policies, self._passages
+        # Cached together with the policy dict it was built from, so a reload can't mix them up
+        if cached is not None and cached[0] is policies:
+            passages = cached[1]
+        else:
+            passages = {chunk["id"]: chunk for chunk in chunk_policies(policies.items())}
+            self._passages = (policies, passages)
+        return {passage_id: passages[passage_id] for passage_id in passage_ids if passage_id in passages}
+
+    def all(self):
+        self._ensure_fresh()
+        return dict(self._policies)
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+import encoders
+import vector_store
+from verdict_cache import VerdictCache
+
+
+# Long-lived resources shared by every request in the API process.
+# The encoder and the vector store are loaded once (at startup via warm_up, or lazily on
+# first use) and then reused, instead of being rebuilt inside every similarity_search call.
+# The encoder backends (torch, onnxruntime) and openai are imported by the loaders, not at module
+# import, so importing this module costs nothing until a resource is actually needed.
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+INDEX_NAME = "reddit-policies"
+
+_lock = threading.Lock()
+_ready = threading.Event()
+
+_model = None
+_store = None
+_openai = None
+_async_openai = None
+_verdict_cache = None
+
+_stats = {
+    "encoder_backend": None,
+    "model_load_seconds": None,
+    "index_load_seconds": None,
+    "encode_count": 0,
+    "encode_seconds_total": 0.0,
+    "last_encode_seconds": None,
+}
+_stats_lock = threading.Lock()
+
+
+def _snapshot():
+    # The policy snapshot named by POLICY_SNAPSHOT, if any (see snapshot.py)
+    if not os.getenv("POLICY_SNAPSHOT"):
+        return None
+    import snapshot
+
+    return snapshot.current()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            # Another thread may have loaded it while we were waiting for the lock
+            if _model is None:
+                backend = encoders.encoder_backend()
+                start = time.perf_counter()
+                # fp32 PyTorch by default, or an int8 / ONNX variant picked with ENCODER_BACKEND.
+                # With a policy snapshot the weights come from the snapshot instead of the hub.
+                _model = encoders.load_encoder(_snapshot().encoder_dir if _snapshot() else MODEL_NAME, backend)
+                _stats["model_load_seconds"] = time.perf_counter() - start
+                _stats["encoder_backend"] = backend
+                print(f"Loaded encoder '{MODEL_NAME}' ({backend}) in {_stats['model_load_seconds']:.2f}s")
+    return _model
+
+
+def get_vector_store():
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                start = time.perf_counter()
+                if _snapshot():
+                    _store = _snapshot().vector_store()
+                else:
+                    _store = vector_store.create_vector_store(INDEX_NAME)
+                _stats["index_load_seconds"] = time.perf_counter() - start
+                print(f"Opened vector store '{type(_store).__name__}' in {_stats['index_load_seconds']:.2f}s")
+    return _store
+
+
+def get_openai():
+    global _openai
+    if _openai is None:
+        with _lock:
+            if _openai is None:
+                from openai import OpenAI
+
+                _openai = OpenAI(api_key=os.environ['OPENAI_API_KEY'])
+    return _openai
+
+
+def get_async_openai():
+    global _async_openai
+    if _async_openai is None:
+        with _lock:
+            if _async_openai is None:
+                from openai import AsyncOpenAI
+
+                _async_openai = AsyncOpenAI(api_key=os.environ['OPENAI_API_KEY'])
+    return _async_openai
+
+
+def get_verdict_cache():
+    global _verdict_cache
+    if _verdict_cache is None:
+        with _lock:
+            if _verdict_cache is None:
+                _verdict_cache = VerdictCache()
+    return _verdict_cache
+
+
+def set_resources(model=None, store=None, openai=None, async_openai=None, verdict_cache=None):
+    # Install pre-built resources (e.g. the stand-ins in fakes.py) and mark the process ready
+    global _model, _store, _openai, _async_openai, _verdict_cache
+    with _lock:
+        _model = model if model is not None else _model
+        _store = store if store is not None else _store
+        _openai = openai if openai is not None else _openai
+        _async_openai = async_openai if async_openai is not None else _async_openai
+        _verdict_cache = verdict_cache if verdict_cache is not None else _verdict_cache
+    _ready.set()
+
+
+def encode(text):
+    model = get_model()
+
+    start = time.perf_counter()
+    vector = model.encode(text).tolist()
+    elapsed = time.perf_counter() - start
+
+    with _stats_lock:
+        _stats["encode_count"] += 1
+        _stats["encode_seconds_total"] += elapsed
+        _stats["last_encode_seconds"] = elapsed
+    print(f"Encoded query in {elapsed * 1000:.1f}ms")
+
+    return vector
+
+
+def encode_batch(texts, batch_size=32):
+    model = get_model()
+
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size).tolist()
+    elapsed = time.perf_counter() - start
+
+    with _stats_lock:
+        _stats["encode_count"] += 1
+        _stats["encode_seconds_total"] += elapsed
+        _stats["last_encode_seconds"] = elapsed
+    print(f"Encoded {len(texts)} queries in {elapsed * 1000:.1f}ms")
+
+    return vectors
+
+
+def warm_up(*loaders):
+    get_model()
+    get_vector_store()
+
+    # Other process-wide caches (e.g. the policy store) that must be filled before serving
+    for loader in loaders:
+        loader()
+
+    # The first forward pass is noticeably slower than the rest, so pay for it before serving
+    get_model().encode("warm up")
+
+    _ready.set()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def stats():
+    with _stats_lock:
+        snapshot = dict(_stats)
+    if snapshot["encode_count"]:
+        snapshot["encode_seconds_avg"] = snapshot["encode_seconds_total"] / snapshot["encode_count"]
+    else:
+        snapshot["encode_seconds_avg"] = None
+    snapshot["ready"] = is_ready()
+    return snapshot
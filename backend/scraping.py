@@ -0,0 +1,35 @@
+import csv
+from policy_scraper import PolicyScraper
+
+
+# Scraping side of the policy pipeline: fetch the Reddit policy pages and keep them in the
+# reddit_policies.csv working copy that the upload and refresh steps read.
+
+
+def scrape_reddit_policies(filename="reddit_policies.csv"):
+    # Concurrent HTTP fetches, with a pooled headless browser only for pages that need JS
+    content_dict, report = PolicyScraper().scrape()
+
+    # Writing to CSV
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        fieldnames = ['key', 'value']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+
+        writer.writeheader()
+        for key, value in content_dict.items():
+            writer.writerow({'key': key, 'value': value})
+
+    print(f"CSV file '{filename}' created successfully.")
+
+    return report
+
+
+def read_policies_csv(file_path):
+    policies = {}
+    with open(file_path, mode='r', encoding='utf-8') as csv_file:
+        csv_reader = csv.reader(csv_file)
+        next(csv_reader)  # Skip header row
+        for row in csv_reader:
+            # A repeated key keeps its last value, like re-running the old row-by-row insert did
+            policies[row[0]] = row[1]
+    return policies
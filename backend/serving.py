@@ -0,0 +1,279 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+import resources
+import chunking
+import moderation
+import warehouse
+from single_flight import SingleFlight
+from verdict_cache import cache_key
+
+
+# Non-blocking version of the /llm-response path (similarity_search + check_policies).
+# Encoding is CPU bound, so it runs in a small bounded pool; the vector query and the policy
+# lookup use blocking clients and run in a separate I/O pool; the completion goes through the
+# async OpenAI client. Each upstream call has its own timeout, so a slow dependency fails the
+# request instead of piling up work on the event loop.
+
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+IO_WORKERS = int(os.getenv("IO_WORKERS", "32"))
+
+VECTOR_QUERY_TIMEOUT = float(os.getenv("VECTOR_QUERY_TIMEOUT", "5"))
+POLICY_LOOKUP_TIMEOUT = float(os.getenv("POLICY_LOOKUP_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+
+TOP_K = 6
+
+# Batch moderation: largest accepted batch and number of completions in flight per batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "256"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+_single_flight = SingleFlight()
+
+_embed_pool = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+class UpstreamTimeout(Exception):
+
+    def __init__(self, stage, timeout):
+        super().__init__(f"{stage} did not answer within {timeout:.1f}s")
+        self.stage = stage
+
+
+async def _run(pool, stage, timeout, func, *args):
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.track_stage(stage):
+            return await asyncio.wait_for(loop.run_in_executor(pool, func, *args), timeout)
+    except asyncio.TimeoutError:
+        metrics.stage_timeout(stage)
+        raise UpstreamTimeout(stage, timeout)
+
+
+async def encode(text):
+    loop = asyncio.get_running_loop()
+    # Includes the wait for a free encoder thread
+    with metrics.track_stage("encode"):
+        return await loop.run_in_executor(_embed_pool, resources.encode, text)
+
+
+async def encode_batch(texts):
+    loop = asyncio.get_running_loop()
+    with metrics.track_stage("encode"):
+        return await loop.run_in_executor(_embed_pool, resources.encode_batch, texts)
+
+
+async def retrieve(query_vector, top_k=TOP_K):
+    store = resources.get_vector_store()
+    policy_store = warehouse.policy_store
+
+    if chunking.RETRIEVAL_MODE == "passage":
+        matches = await _run(_io_pool, "vector query", VECTOR_QUERY_TIMEOUT, store.query,
+                             query_vector, chunking.PASSAGE_TOP_K)
+        passages = await _run(_io_pool, "policy lookup", POLICY_LOOKUP_TIMEOUT, policy_store.get_passages,
+                              [match['id'] for match in matches])
+        return chunking.assemble_passages(matches, passages)
+
+    matches = await _run(_io_pool, "vector query", VECTOR_QUERY_TIMEOUT, store.query, query_vector, top_k)
+
+    match_ids = [match['id'] for match in matches]
+
+    return await _run(_io_pool, "policy lookup", POLICY_LOOKUP_TIMEOUT, policy_store.get, match_ids)
+
+
+async def similarity_search(text, top_k=TOP_K):
+    query_vector = await encode(text)
+
+    return await retrieve(query_vector, top_k)
+
+
+async def cached_verdict(text):
+    # The cache key only depends on the text and the policy version, so every path looks it up
+    # before paying for the encode, the vector query and the policy lookup
+    cache = resources.get_verdict_cache()
+    cached_response = await _run(_io_pool, "verdict cache", POLICY_LOOKUP_TIMEOUT, cache.get,
+                                 moderation.VERDICT_NAMESPACE, text, warehouse.policy_store.version)
+    metrics.cache_result("verdict", cached_response is not None)
+    return cached_response
+
+
+async def complete(text, policies):
+    # Completion for a text that missed the verdict cache; the response is cached
+    cache = resources.get_verdict_cache()
+    policy_version = warehouse.policy_store.version
+
+    client = resources.get_async_openai()
+
+    prompt = moderation.build_prompt(text, policies)
+
+    try:
+        with metrics.track_stage("completion"):
+            response = await asyncio.wait_for(
+                client.completions.create(prompt=prompt, **moderation.COMPLETION_PARAMS),
+                LLM_TIMEOUT
+            )
+    except asyncio.TimeoutError:
+        metrics.stage_timeout("completion")
+        raise UpstreamTimeout("completion", LLM_TIMEOUT)
+
+    generated_response = response.choices[0].text
+
+    await _run(_io_pool, "verdict cache", POLICY_LOOKUP_TIMEOUT, cache.set,
+               moderation.VERDICT_NAMESPACE, text, policy_version, generated_response)
+
+    return generated_response
+
+
+def _flight_key(text):
+    # Same key as the verdict cache: normalized text, namespace and policy version
+    return cache_key(moderation.VERDICT_NAMESPACE, text, warehouse.policy_store.version)
+
+
+async def _single_flight_do(text, compute):
+    result, coalesced = await _single_flight.do(_flight_key(text), compute)
+    metrics.single_flight_result(coalesced)
+    return result
+
+
+def single_flight_stats():
+    return _single_flight.stats()
+
+
+async def moderate(text):
+    # Identical requests arriving together (bot waves, brigading) share one embedding,
+    # retrieval and completion
+    async def compute():
+        cached_response = await cached_verdict(text)
+        if cached_response is not None:
+            return cached_response
+
+        policies = await similarity_search(text)
+
+        return await complete(text, policies)
+
+    return await _single_flight_do(text, compute)
+
+
+async def _next_chunk(stream):
+    try:
+        return await asyncio.wait_for(stream.__anext__(), LLM_TIMEOUT)
+    except StopAsyncIteration:
+        return None
+    except asyncio.TimeoutError:
+        metrics.stage_timeout("completion")
+        raise UpstreamTimeout("completion", LLM_TIMEOUT)
+
+
+async def moderate_stream(text):
+    # Yields (event, data) pairs: one "verdict" as soon as the Policy Violation line has been
+    # generated, a "token" per completion chunk, then "done" with the full response.
+    # A cached verdict is replayed as the same sequence in one go.
+    cache = resources.get_verdict_cache()
+    policy_version = warehouse.policy_store.version
+
+    cached_response = await cached_verdict(text)
+    if cached_response is not None:
+        yield "verdict", {"policy_violation": moderation.parse_verdict(cached_response), "cached": True}
+        yield "token", {"text": cached_response}
+        yield "done", {"generated_response": cached_response, "cached": True}
+        return
+
+    policies = await similarity_search(text)
+
+    client = resources.get_async_openai()
+
+    prompt = moderation.build_prompt(text, policies)
+
+    try:
+        stream = await asyncio.wait_for(
+            client.completions.create(prompt=prompt, stream=True, **moderation.COMPLETION_PARAMS),
+            LLM_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        metrics.stage_timeout("completion")
+        raise UpstreamTimeout("completion", LLM_TIMEOUT)
+
+    completion_start = time.perf_counter()
+
+    generated_response = ""
+    verdict = None
+
+    while True:
+        chunk = await _next_chunk(stream)
+        if chunk is None:
+            break
+        if not chunk.choices:
+            continue
+
+        token = chunk.choices[0].text
+        generated_response += token
+        yield "token", {"text": token}
+
+        if verdict is None:
+            verdict = moderation.parse_verdict(generated_response)
+            if verdict is not None:
+                metrics.observe_stage("completion_verdict", time.perf_counter() - completion_start)
+                yield "verdict", {"policy_violation": verdict, "cached": False}
+
+    metrics.observe_stage("completion_stream", time.perf_counter() - completion_start)
+
+    if verdict is None:
+        # The completion never produced a parsable verdict line
+        yield "verdict", {"policy_violation": None, "cached": False}
+
+    # Only complete responses are cached
+    await _run(_io_pool, "verdict cache", POLICY_LOOKUP_TIMEOUT, cache.set,
+               moderation.VERDICT_NAMESPACE, text, policy_version, generated_response)
+
+    yield "done", {"generated_response": generated_response, "cached": False}
+
+
+async def moderate_batch(texts):
+    if not texts:
+        return []
+
+    # Identical texts are only adjudicated once
+    unique_texts = list(dict.fromkeys(texts))
+    by_text = {}
+
+    async def lookup(text):
+        try:
+            return await cached_verdict(text)
+        except Exception as e:
+            by_text[text] = {"generated_response": None, "error": str(e) or type(e).__name__}
+
+    # Cached texts are answered without being encoded or retrieved for
+    cached_responses = await asyncio.gather(*(lookup(text) for text in unique_texts))
+    for text, cached_response in zip(unique_texts, cached_responses):
+        if cached_response is not None:
+            by_text[text] = {"generated_response": cached_response, "error": None}
+    missed_texts = [text for text in unique_texts if text not in by_text]
+
+    # One batched forward pass for the rest of the request
+    query_vectors = await encode_batch(missed_texts) if missed_texts else []
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def moderate_one(text, query_vector):
+        async def compute():
+            policies = await retrieve(query_vector)
+            async with semaphore:
+                return await complete(text, policies)
+
+        try:
+            # Also joins identical texts in flight from other requests
+            generated_response = await _single_flight_do(text, compute)
+            return {"generated_response": generated_response, "error": None}
+        except Exception as e:
+            return {"generated_response": None, "error": str(e) or type(e).__name__}
+
+    results = await asyncio.gather(*(
+        moderate_one(text, query_vector) for text, query_vector in zip(missed_texts, query_vectors)
+    ))
+    by_text.update(zip(missed_texts, results))
+
+    # Back in input order, duplicates included
+    return [{"text": text, **by_text[text]} for text in texts]
@@ -0,0 +1,47 @@
+import asyncio
+
+
+# Single-flight deduplication for the async request path. While a computation for a key is in
+# flight, every other caller with the same key awaits that computation instead of starting its own,
+# and all of them receive its result (or its exception). Keys come from verdict_cache.cache_key, so
+# "the same request" means the same normalized text against the same policy version, exactly what
+# the verdict cache treats as the same verdict.
+# The shared computation runs as its own task: a caller that disconnects or times out stops
+# waiting, but the others still get the result.
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self._in_flight = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    async def do(self, key, compute):
+        # compute: zero-argument coroutine function, only called by the first caller for key
+        task = self._in_flight.get(key)
+        if task is None:
+            self._stats["leaders"] += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            coalesced = False
+        else:
+            self._stats["coalesced"] += 1
+            coalesced = True
+
+        return await asyncio.shield(task), coalesced
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Marks the exception as retrieved even if every caller has stopped waiting
+            task.exception()
+
+    def stats(self):
+        total = self._stats["leaders"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "in_flight": len(self._in_flight),
+            "coalesced_ratio": self._stats["coalesced"] / total if total else 0.0,
+        }
@@ -0,0 +1,392 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+import chunking
+import encoders
+import resources
+from policy_manifest import content_hash, policy_set_version
+from vector_store import LocalVectorStore
+
+
+# Precompiled policy snapshots: everything a serving process needs for retrieval in one local,
+# versioned directory, so it can start without Snowflake, Pinecone or the Hugging Face hub.
+#   manifest.json   format, policy version, encoder, retrieval mode, row count, sha256 of every file
+#   policies.json   {key: policy text}
+#   rows.json       id of each matrix row (policy keys, or passage ids) and, for passages, their
+#                   chunk metadata (parent, index, start / end offsets into the policy text)
+#   vectors.npy     float32 matrix of unit-length embeddings, one row per id
+#   encoder/        the sentence encoder saved with SentenceTransformer.save (plus encoder/onnx
+#                   when built with an ONNX ENCODER_BACKEND)
+# vectors.npy is opened with np.load(mmap_mode="r"): opening costs a few ms whatever its size, and
+# every process on the host (API workers, Mage blocks) shares the same page-cache pages.
+# Snapshots are built under SNAPSHOT_ROOT/<version> and CURRENT names the latest one. Set
+# POLICY_SNAPSHOT to a snapshot (or to the root, to follow CURRENT) and the policy store, the
+# vector store and the encoder all come from it. A process keeps the snapshot it opened; roll a new
+# one out by restarting the workers.
+#
+#   python snapshot.py build --policies reddit_policies.csv
+#   python snapshot.py inspect snapshots
+#   python snapshot.py verify snapshots --reencode 20
+
+FORMAT = 1
+
+DEFAULT_ROOT = "snapshots"
+
+MANIFEST = "manifest.json"
+POLICIES = "policies.json"
+ROWS = "rows.json"
+VECTORS = "vectors.npy"
+ENCODER = "encoder"
+CURRENT = "CURRENT"
+
+READ_ONLY = "Policy snapshots are read-only; build a new one with snapshot.py build"
+
+
+def snapshot_path():
+    return os.getenv("POLICY_SNAPSHOT")
+
+
+def resolve(path):
+    # A snapshot directory, or a root whose CURRENT file names one
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        return path
+    current = os.path.join(path, CURRENT)
+    if os.path.exists(current):
+        with open(current, encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    raise FileNotFoundError(f"No policy snapshot at '{path}'")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_files(directory):
+    # Relative paths of every file except the manifest, in a stable order
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            relative = os.path.relpath(os.path.join(root, name), directory)
+            if relative != MANIFEST:
+                files.append(relative.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def build(policies, root=DEFAULT_ROOT, model_name=resources.MODEL_NAME, backend=None, batch_size=32, force=False):
+    # policies: {key: text}. Returns the path of the snapshot; an identical one is reused.
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or encoders.encoder_backend()
+    start = time.perf_counter()
+
+    policy_version = policy_set_version({key: content_hash(value) for key, value in policies.items()})
+    settings = {
+        "model_name": model_name,
+        "encoder_backend": backend,
+        "retrieval_mode": chunking.RETRIEVAL_MODE,
+        "chunk_words": chunking.CHUNK_WORDS,
+        "chunk_overlap_words": chunking.CHUNK_OVERLAP_WORDS,
+    }
+    settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    name = f"{policy_version}-{settings_hash}"
+    path = os.path.join(root, name)
+
+    if os.path.exists(os.path.join(path, MANIFEST)) and not force:
+        print(f"Snapshot {name} already built")
+    else:
+        # Built in a temporary directory and renamed, so a reader never opens a half-written one
+        tmp_path = os.path.join(root, f".{name}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        encoder_dir = os.path.join(tmp_path, ENCODER)
+        SentenceTransformer(model_name, device="cpu").save(encoder_dir)
+        # Embedded with the saved copy, so the vectors match the weights that ship with them
+        model = encoders.load_encoder(encoder_dir, backend)
+
+        if chunking.RETRIEVAL_MODE == "passage":
+            chunks = list(chunking.chunk_policies(policies.items()))
+            rows = [{key: chunk[key] for key in ("id", "parent", "index", "start", "end")} for chunk in chunks]
+            texts = [chunk["text"] for chunk in chunks]
+        else:
+            rows = [{"id": key} for key in policies]
+            texts = list(policies.values())
+
+        vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        np.save(os.path.join(tmp_path, VECTORS), np.ascontiguousarray(vectors / norms))
+
+        with open(os.path.join(tmp_path, POLICIES), "w", encoding="utf-8") as f:
+            json.dump(policies, f)
+        with open(os.path.join(tmp_path, ROWS), "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+
+        manifest = {
+            "format": FORMAT,
+            "name": name,
+            "policy_version": policy_version,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **settings,
+            "policies": len(policies),
+            "rows": len(rows),
+            "dimension": model.get_sentence_embedding_dimension(),
+            "files": {relative: file_sha256(os.path.join(tmp_path, relative)) for relative in list_files(tmp_path)},
+        }
+        with open(os.path.join(tmp_path, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        print(f"Built snapshot {name}: {len(policies)} policies, {len(rows)} vectors in {time.perf_counter() - start:.2f}s")
+
+    current_tmp = os.path.join(root, CURRENT + ".tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(current_tmp, os.path.join(root, CURRENT))
+    return path
+
+
+class SnapshotVectorStore(LocalVectorStore):
+    # LocalVectorStore over the memory-mapped matrix of a snapshot; rebuild the snapshot to change it
+
+    def __init__(self, ids, matrix, metadata):
+        super().__init__(path=None)
+        self._data = (ids, matrix)
+        self._metadata = metadata
+
+    def upsert(self, items):
+        raise RuntimeError(READ_ONLY)
+
+    def delete(self, ids):
+        raise RuntimeError(READ_ONLY)
+
+    def save(self):
+        raise RuntimeError(READ_ONLY)
+
+
+class Snapshot:
+
+    def __init__(self, path):
+        start = time.perf_counter()
+        self.path = resolve(path)
+
+        with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["format"] != FORMAT:
+            raise ValueError(f"Snapshot format {self.manifest['format']} is not supported (expected {FORMAT})")
+
+        with open(os.path.join(self.path, POLICIES), encoding="utf-8") as f:
+            self.policies = json.load(f)
+        with open(os.path.join(self.path, ROWS), encoding="utf-8") as f:
+            self.rows = json.load(f)
+        self.ids = [row["id"] for row in self.rows]
+        self.vectors = np.load(os.path.join(self.path, VECTORS), mmap_mode="r")
+
+        self.version = self.manifest["policy_version"]
+        self.retrieval_mode = self.manifest["retrieval_mode"]
+        self.open_seconds = time.perf_counter() - start
+
+    @property
+    def encoder_dir(self):
+        return os.path.join(self.path, ENCODER)
+
+    def passages(self):
+        # Rebuilt from the offsets, like PolicyStore.get_passages rebuilds them from the policy text
+        passages = {}
+        for row in self.rows:
+            text = self.policies[row["parent"]]
+            passages[row["id"]] = {**row, "text": text[row["start"]:row["end"]]}
+        return passages
+
+    def vector_store(self):
+        metadata = {}
+        if self.retrieval_mode == "passage":
+            metadata = {row["id"]: {"parent": row["parent"], "index": row["index"]} for row in self.rows}
+        return SnapshotVectorStore(self.ids, self.vectors, metadata)
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def current():
+    # The snapshot named by POLICY_SNAPSHOT, opened once per process
+    global _snapshot
+    if _snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                snapshot = Snapshot(snapshot_path())
+                if snapshot.retrieval_mode != chunking.RETRIEVAL_MODE:
+                    raise ValueError(f"Snapshot {snapshot.manifest['name']} was built for RETRIEVAL_MODE="
+                                     f"{snapshot.retrieval_mode}, this process uses {chunking.RETRIEVAL_MODE}")
+                if snapshot.manifest["encoder_backend"] != encoders.encoder_backend():
+                    print(f"Snapshot vectors were embedded with {snapshot.manifest['encoder_backend']}, queries use "
+                          f"{encoders.encoder_backend()}; check retrieval with bench_encoder.py")
+                print(f"Opened policy snapshot {snapshot.manifest['name']} ({len(snapshot.ids)} vectors) "
+                      f"in {snapshot.open_seconds * 1000:.1f}ms")
+                _snapshot = snapshot
+    return _snapshot
+
+
+class SnapshotPolicyStore:
+    # Same interface as PolicyStore, served from the snapshot instead of the REDDIT_POLICIES table
+
+    def __init__(self):
+        self._passages = None
+        self.loads = 0
+        self.version_checks = 0
+
+    @property
+    def version(self):
+        return current().version
+
+    def refresh(self, force=False):
+        current()
+
+    def invalidate(self):
+        # A snapshot never changes; a new policy set means a new snapshot and a restart
+        pass
+
+    def get(self, keys):
+        policies = current().policies
+        return {key: policies[key] for key in keys if key in policies}
+
+    def get_passages(self, passage_ids):
+        if self._passages is None:
+            self._passages = current().passages()
+        passages = self._passages
+        return {passage_id: passages[passage_id] for passage_id in passage_ids if passage_id in passages}
+
+    def all(self):
+        return dict(current().policies)
+
+
+def inspect(path):
+    snapshot = Snapshot(path)
+    manifest = snapshot.manifest
+    sizes = {relative: os.path.getsize(os.path.join(snapshot.path, relative)) for relative in manifest["files"]}
+    encoder_bytes = sum(size for relative, size in sizes.items() if relative.startswith(ENCODER + "/"))
+
+    print(f"Snapshot {manifest['name']} at {snapshot.path}")
+    print(f"  policy version  {manifest['policy_version']} ({manifest['policies']} policies), built {manifest['created']}")
+    print(f"  encoder         {manifest['model_name']} ({manifest['encoder_backend']}), {encoder_bytes / 1e6:.1f} MB")
+    print(f"  retrieval       {manifest['retrieval_mode']}, {manifest['rows']} x {manifest['dimension']} vectors, "
+          f"{sizes[VECTORS] / 1e6:.1f} MB")
+    if manifest["retrieval_mode"] == "passage":
+        print(f"  chunking        {manifest['chunk_words']} words, {manifest['chunk_overlap_words']} overlap")
+    print(f"  opened in       {snapshot.open_seconds * 1000:.1f}ms")
+
+
+def verify(path, reencode=0):
+    # Returns the list of problems found, empty when the snapshot is intact
+    snapshot = Snapshot(path)
+    manifest = snapshot.manifest
+    problems = []
+
+    files = list_files(snapshot.path)
+    for relative in sorted(set(files) - set(manifest["files"])):
+        # Graphs exported after the build (an ONNX backend switched on later) are not listed
+        if not relative.startswith(f"{ENCODER}/onnx/"):
+            problems.append(f"unexpected file {relative}")
+    for relative, expected in manifest["files"].items():
+        if relative not in files:
+            problems.append(f"missing file {relative}")
+        elif file_sha256(os.path.join(snapshot.path, relative)) != expected:
+            problems.append(f"checksum mismatch for {relative}")
+
+    if snapshot.vectors.dtype != np.float32 or snapshot.vectors.shape != (manifest["rows"], manifest["dimension"]):
+        problems.append(f"vectors are {snapshot.vectors.dtype} {snapshot.vectors.shape}, "
+                        f"expected float32 ({manifest['rows']}, {manifest['dimension']})")
+    elif len(snapshot.vectors):
+        norms = np.linalg.norm(snapshot.vectors, axis=1)
+        if not np.allclose(norms, 1.0, atol=1e-3):
+            problems.append(f"{int((np.abs(norms - 1.0) > 1e-3).sum())} vectors are not unit length")
+
+    if len(set(snapshot.ids)) != len(snapshot.ids):
+        problems.append("duplicate row ids")
+    if len(snapshot.policies) != manifest["policies"]:
+        problems.append(f"{len(snapshot.policies)} policies, manifest says {manifest['policies']}")
+    policy_version = policy_set_version({key: content_hash(value) for key, value in snapshot.policies.items()})
+    if policy_version != manifest["policy_version"]:
+        problems.append(f"policy texts hash to version {policy_version}, manifest says {manifest['policy_version']}")
+
+    for row in snapshot.rows:
+        if manifest["retrieval_mode"] == "passage":
+            text = snapshot.policies.get(row["parent"])
+            if text is None or not 0 <= row["start"] < row["end"] <= len(text):
+                problems.append(f"passage {row['id']} does not point into its policy")
+        elif row["id"] not in snapshot.policies:
+            problems.append(f"row {row['id']} has no policy text")
+
+    if reencode and not problems:
+        # Re-embed a sample with the bundled encoder; the stored vectors must match
+        model = encoders.load_encoder(snapshot.encoder_dir, manifest["encoder_backend"])
+        sample = np.linspace(0, len(snapshot.rows) - 1, min(reencode, len(snapshot.rows))).astype(int)
+        if manifest["retrieval_mode"] == "passage":
+            passages = snapshot.passages()
+            texts = [passages[snapshot.ids[row]]["text"] for row in sample]
+        else:
+            texts = [snapshot.policies[snapshot.ids[row]] for row in sample]
+        vectors = np.asarray(model.encode(texts), dtype=np.float32).reshape(len(texts), -1)
+        vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        similarity = (vectors * snapshot.vectors[sample]).sum(axis=1)
+        if similarity.min() < 0.999:
+            problems.append(f"re-encoded vectors differ from the stored ones (min cosine {similarity.min():.4f})")
+
+    return problems
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Build, inspect and verify policy snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="compile the current policy set into a snapshot")
+    build_parser.add_argument("--policies", help="scraped policy CSV (key, value); default: the REDDIT_POLICIES table")
+    build_parser.add_argument("--root", default=os.getenv("SNAPSHOT_ROOT", DEFAULT_ROOT))
+    build_parser.add_argument("--model", default=resources.MODEL_NAME)
+    build_parser.add_argument("--batch-size", type=int, default=32)
+    build_parser.add_argument("--force", action="store_true", help="rebuild even if an identical snapshot exists")
+
+    for name in ("inspect", "verify"):
+        command_parser = commands.add_parser(name)
+        command_parser.add_argument("path", nargs="?", default=os.getenv("POLICY_SNAPSHOT", DEFAULT_ROOT),
+                                    help="snapshot directory, or a root with a CURRENT file")
+    commands.choices["verify"].add_argument("--reencode", type=int, default=0,
+                                            help="re-embed this many rows and compare them to the stored vectors")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.policies:
+            from scraping import read_policies_csv
+
+            policies = read_policies_csv(args.policies)
+        else:
+            import warehouse
+
+            policies = warehouse.load_policy_table()
+        build(policies, args.root, args.model, batch_size=args.batch_size, force=args.force)
+    elif args.command == "inspect":
+        inspect(args.path)
+    else:
+        problems = verify(args.path, args.reencode)
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        print("Snapshot OK" if not problems else f"{len(problems)} problems found")
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Pool of authenticated Snowflake sessions shared by the backend helpers.
+# Opening a session (login + handshake) usually takes longer than the queries we run on it,
+# so connections are borrowed and returned instead of being opened and closed per call.
+#   - at most max_size sessions are open; borrowers wait up to acquire_timeout for one
+#   - sessions idle for longer than idle_timeout are closed
+#   - sessions idle for longer than health_check_interval are pinged before being handed out
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class SnowflakePool:
+
+    def __init__(self, connect, max_size=None, idle_timeout=None, health_check_interval=None, acquire_timeout=None):
+        self._connect = connect
+        # An explicit 0 is kept (e.g. acquire_timeout=0 never waits); only None falls back to the settings
+        self.max_size = max_size if max_size is not None else int(os.getenv("SNOWFLAKE_POOL_SIZE", "4"))
+        self.idle_timeout = (idle_timeout if idle_timeout is not None
+                             else float(os.getenv("SNOWFLAKE_POOL_IDLE_TIMEOUT", "600")))
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else float(os.getenv("SNOWFLAKE_POOL_HEALTH_CHECK", "60")))
+        self.acquire_timeout = (acquire_timeout if acquire_timeout is not None
+                                else float(os.getenv("SNOWFLAKE_POOL_ACQUIRE_TIMEOUT", "30")))
+
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._size = 0   # open connections, idle or borrowed
+
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "closed": 0,
+            "health_check_failures": 0,
+            "acquires": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _close_connection(self, conn):
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"Error closing Snowflake connection: {e}")
+
+    def _close(self, conn):
+        self._close_connection(conn)
+        self._size -= 1
+        self._stats["closed"] += 1
+
+    def _evict_idle(self, now):
+        # Idle list is ordered by return time, so stale connections are at the front
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.pop(0)
+            self._close(conn)
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.is_closed():
+            return False
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute("SELECT 1")
+            finally:
+                cur.close()
+            return True
+        except Exception as e:
+            print(f"Snowflake connection failed its health check: {e}")
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    self._evict_idle(now)
+
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        break
+
+                    if self._size < self.max_size:
+                        # Reserve a slot, then connect without holding the lock
+                        self._size += 1
+                        conn = None
+                        break
+
+                    if now >= deadline:
+                        raise PoolTimeout(f"No Snowflake connection available after {self.acquire_timeout:.0f}s")
+                    self._cond.wait(deadline - now)
+
+            if conn is None:
+                break
+
+            # The connection is already out of the idle list, so the SELECT 1 round trip runs
+            # without holding up the other borrowers
+            if self._is_healthy(conn, returned_at):
+                with self._cond:
+                    self._stats["reused"] += 1
+                    self._record_wait(start)
+                return conn
+
+            self._close_connection(conn)
+            with self._cond:
+                self._size -= 1
+                self._stats["closed"] += 1
+                self._stats["health_check_failures"] += 1
+                self._cond.notify()
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._stats["created"] += 1
+            self._record_wait(start)
+        return conn
+
+    def _record_wait(self, start):
+        waited = time.monotonic() - start
+        self._stats["acquires"] += 1
+        self._stats["wait_seconds_total"] += waited
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+    def release(self, conn, discard=False):
+        with self._cond:
+            if discard or conn.is_closed():
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            # Leave no half-finished transaction behind for the next borrower
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    @contextmanager
+    def cursor(self):
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["open"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / stats["acquires"] if stats["acquires"] else None
+        acquired = stats["created"] + stats["reused"]
+        stats["reuse_rate"] = stats["reused"] / acquired if acquired else None
+        return stats
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fakes import stream_tokens
+
+
+# Local stand-in for the OpenAI completions endpoint, for measuring the streaming API without
+# the real model. It answers POST /v1/completions like the OpenAI API (plain JSON, or
+# server-sent events with stream=true) after a fixed first-token latency plus a per-token delay.
+# Point the client at it with base_url="http://127.0.0.1:<port>/v1".
+#
+#   python stub_model_server.py --port 8001 --first-token-latency 0.3 --token-latency 0.02
+
+STUB_RESPONSE = (
+    "Policy Violation: True\n"
+    "Reason: The post targets a specific user with repeated insults and encourages others to "
+    "harass them across several communities. This is harassment and bullying as described in the "
+    "content policy, and the call to pile on makes it a coordinated attack rather than a heated "
+    "disagreement. Posts that single out individuals this way are not allowed regardless of the "
+    "subreddit they are posted in."
+)
+
+app = FastAPI()
+app.state.first_token_latency = 0.3
+app.state.token_latency = 0.02
+app.state.response = STUB_RESPONSE
+
+
+def completion_chunk(completion_id, model, text, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"text": text, "index": 0, "logprobs": None, "finish_reason": finish_reason}],
+    }
+
+
+@app.post("/v1/completions")
+async def completions_f(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    completion_id = f"cmpl-{uuid.uuid4().hex}"
+    tokens = stream_tokens(app.state.response)
+
+    await asyncio.sleep(app.state.first_token_latency)
+
+    if not body.get("stream"):
+        await asyncio.sleep(app.state.token_latency * len(tokens))
+        completion = completion_chunk(completion_id, model, app.state.response, "stop")
+        completion["usage"] = {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+        return completion
+
+    async def events():
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(app.state.token_latency)
+            yield f"data: {json.dumps(completion_chunk(completion_id, model, token))}\n\n"
+        yield f"data: {json.dumps(completion_chunk(completion_id, model, '', 'stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def configure(first_token_latency, token_latency, response=STUB_RESPONSE):
+    app.state.first_token_latency = first_token_latency
+    app.state.token_latency = token_latency
+    app.state.response = response
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub OpenAI completions server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    configure(args.first_token_latency, args.token_latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
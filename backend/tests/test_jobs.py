@@ -0,0 +1,74 @@
+import threading
+import time
+import jobs
+
+
+# Several JobRunners on one job table stand in for the API workers of one deployment.
+
+
+def wait_for(runner, job_id, states=(jobs.SUCCEEDED, jobs.FAILED), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get(job_id)
+        if job["state"] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {runner.get(job_id)['state']}")
+
+
+def test_a_live_worker_keeps_its_running_job(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    release = threading.Event()
+    runs = []
+
+    def slow_job(job):
+        runs.append(job.runner.owner)
+        release.wait(5)
+        return {"ok": True}
+
+    first = jobs.JobRunner(path, heartbeat_interval=0.05, stale_after=0.5)
+    first.register("refresh", slow_job)
+    job, _ = first.submit("refresh")
+    wait_for(first, job["job_id"], states=(jobs.RUNNING,))
+
+    # A sibling starting up while the job runs well past stale_after must not run it too
+    second = jobs.JobRunner(path, heartbeat_interval=0.05, stale_after=0.5)
+    second.register("refresh", slow_job)
+    assert second.resume() == []
+    time.sleep(1.0)
+    release.set()
+
+    assert wait_for(first, job["job_id"])["state"] == jobs.SUCCEEDED
+    assert runs == [first.owner]
+    first.stop()
+    second.stop()
+
+
+def test_a_job_whose_owner_died_is_run_again_by_one_worker(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    runs = []
+
+    def job_function(job):
+        runs.append(job.runner.owner)
+        return {"ok": True}
+
+    # The owner dies (stops heartbeating) before it gets to run the job
+    dead = jobs.JobRunner(path, max_workers=1)
+    dead.stop()
+    dead._executor.submit(time.sleep, 0.5)
+    dead.register("refresh", job_function)
+    job, _ = dead.submit("refresh")
+    dead._update(job["job_id"], heartbeat=time.time() - 3600)
+
+    survivors = [jobs.JobRunner(path, heartbeat_interval=0.05, stale_after=60) for _ in range(3)]
+    for runner in survivors:
+        runner.register("refresh", job_function)
+    resumed = [runner.resume() for runner in survivors]
+
+    assert sum(len(job_ids) for job_ids in resumed) == 1
+    assert wait_for(survivors[0], job["job_id"])["state"] == jobs.SUCCEEDED
+    # The dead owner's executor finally gets to the job, but no longer owns it
+    time.sleep(0.7)
+    assert len(runs) == 1 and runs[0] != dead.owner
+    for runner in survivors:
+        runner.stop()
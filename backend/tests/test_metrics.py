@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+import fakes
+
+
+class FailingStreamOpenAI(fakes.FakeAsyncOpenAI):
+
+    async def _stream(self):
+        yield fakes._completion("Policy")
+        raise RuntimeError("connection reset")
+
+
+def stream_requests(outcome):
+    value = REGISTRY.get_sample_value("safefeed_http_requests_total",
+                                      {"endpoint": "/llm-response/stream", "outcome": outcome})
+    return value or 0.0
+
+
+def test_a_stream_that_fails_after_the_200_is_counted_as_an_error(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    import main
+
+    client = TestClient(main.app)
+    before = {outcome: stream_requests(outcome) for outcome in ("ok", "error")}
+
+    fakes.install_fakes(policies=fakes.fake_policies(count=3, words=20), encode_latency=0, vector_latency=0,
+                        async_openai=FailingStreamOpenAI(latency=0))
+    response = client.post("/llm-response/stream", params={"text": "some post"})
+    assert response.status_code == 200
+    assert "event: error" in response.text
+
+    fakes.install_fakes(policies=fakes.fake_policies(count=3, words=20), encode_latency=0, vector_latency=0,
+                        llm_latency=0)
+    response = client.post("/llm-response/stream", params={"text": "another post"})
+    assert "event: done" in response.text
+
+    assert stream_requests("error") == before["error"] + 1
+    assert stream_requests("ok") == before["ok"] + 1
@@ -0,0 +1,143 @@
+import os
+import threading
+import pytest
+from policy_scraper import (
+    CONTENT_NOT_FOUND,
+    BrowserPool,
+    BrowserPoolTimeout,
+    PolicyScraper,
+    fixture_fetcher,
+    parse_index,
+)
+
+
+# Offline tests against the saved pages in fixtures/policies: the content policy (index.html) links
+# to four rules, rules 1 and 2 have their article in the raw HTML, rule 3 only after JavaScript
+# runs (360043513151-rendered.html is the rendered page) and rule 4 has no saved page at all.
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'policies')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class FakeDriver:
+
+    def __init__(self, page_source=""):
+        self.page_source = page_source
+        self.quit_calls = 0
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+def test_parse_index_keeps_links_and_text_inside_the_content_div():
+    href_dict, content = parse_index(read_fixture('index.html'))
+
+    assert list(href_dict) == ['Rule 1', 'Rule 2', 'Rule 3', 'Rule 4']
+    assert href_dict['Rule 1'] == 'https://support.reddithelp.com/hc/en-us/articles/360043071072'
+    assert content.startswith('Reddit Content Policy')
+    assert 'Remember the human.' in content
+    assert 'Privacy Policy' not in content
+
+
+def test_scrape_from_fixtures_without_a_browser():
+    scraper = PolicyScraper(fetch_html=fixture_fetcher(FIXTURES), use_browser=False)
+    content, report = scraper.scrape()
+
+    assert list(content) == ['home', 'Rule 1', 'Rule 2', 'Rule 3', 'Rule 4']
+    assert content['Rule 1'].startswith('Promoting Hate Based on Identity or Vulnerability Remember the human.')
+    assert content['Rule 2'].startswith('Abide by community rules')
+    assert content['Rule 3'] == CONTENT_NOT_FOUND
+    assert content['Rule 4'] == CONTENT_NOT_FOUND
+    assert (report['http'], report['browser'], report['failed']) == (2, 0, 2)
+
+
+def test_scrape_falls_back_to_the_browser_for_pages_rendered_by_javascript():
+    scraper = PolicyScraper(fetch_html=fixture_fetcher(FIXTURES))
+    rendered = {'360043513151': read_fixture('360043513151-rendered.html')}
+    scraper.browser_pool.fetch = lambda url: rendered.get(url.rsplit('/', 1)[-1], "")
+    content, report = scraper.scrape()
+
+    assert content['Rule 3'].startswith('Respect the privacy of others')
+    assert report['pages']['Rule 3']['method'] == 'browser'
+    assert report['pages']['Rule 4']['method'] == 'failed'
+    assert (report['http'], report['browser'], report['failed']) == (2, 1, 1)
+
+
+def test_browser_pool_frees_the_slot_of_a_browser_that_failed_to_start():
+    pool = BrowserPool(size=2, acquire_timeout=1)
+    attempts = []
+
+    def create_driver():
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise RuntimeError("chrome failed to start")
+        return FakeDriver()
+
+    pool._create_driver = create_driver
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.driver():
+                pass
+
+    # Both failures gave their slot back, so the third caller starts a browser instead of waiting
+    with pool.driver() as driver:
+        assert isinstance(driver, FakeDriver)
+    assert len(attempts) == 3
+    assert pool._created == 1
+
+
+def test_browser_pool_replaces_a_browser_that_errored():
+    pool = BrowserPool(size=1, acquire_timeout=1)
+    drivers = []
+    pool._create_driver = lambda: drivers.append(FakeDriver()) or drivers[-1]
+
+    with pytest.raises(RuntimeError):
+        with pool.driver():
+            raise RuntimeError("page load failed")
+    assert drivers[0].quit_calls == 1
+
+    with pool.driver() as driver:
+        assert driver is drivers[1]
+    with pool.driver() as driver:
+        assert driver is drivers[1]
+    assert pool._created == 1
+
+
+def test_browser_pool_times_out_instead_of_waiting_forever():
+    pool = BrowserPool(size=1, acquire_timeout=0.1)
+    pool._create_driver = FakeDriver
+
+    with pool.driver():
+        errors = []
+
+        def borrow():
+            try:
+                with pool.driver():
+                    pass
+            except BrowserPoolTimeout as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    assert len(errors) == 1
+
+
+def test_browser_pool_close_quits_idle_browsers():
+    pool = BrowserPool(size=2, acquire_timeout=1)
+    pool._create_driver = FakeDriver
+
+    with pool.driver() as first, pool.driver() as second:
+        pass
+    pool.close()
+
+    assert (first.quit_calls, second.quit_calls) == (1, 1)
+    assert pool._created == 0
@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+import numpy as np
+import pytest
+from fastapi import HTTPException, Response
+import fakes
+import ingestion
+import resources
+from snapshot import READ_ONLY, SnapshotVectorStore
+
+
+class FakePool:
+
+    @contextmanager
+    def cursor(self):
+        yield None
+
+
+@pytest.fixture
+def snapshot_store(monkeypatch):
+    ids = ["policy_0", "policy_1"]
+    matrix = np.stack([fakes.fake_vector(key) for key in ids])
+    store = SnapshotVectorStore(ids, matrix, {})
+    monkeypatch.setattr(resources, "_model", fakes.FakeEncoder(latency=0))
+    monkeypatch.setattr(resources, "_store", store)
+    return store
+
+
+def test_vectorize_policies_refuses_a_snapshot_store(snapshot_store, monkeypatch):
+    monkeypatch.setattr(ingestion, "snowflake_pool", FakePool())
+    monkeypatch.setattr(ingestion, "iter_policies", lambda cur, table: iter([("policy_2", "new policy text")]))
+
+    with pytest.raises(RuntimeError, match=READ_ONLY):
+        ingestion.vectorize_policies()
+    assert snapshot_store.query(fakes.fake_vector("policy_0"), top_k=3)[0]["id"] == "policy_0"
+    assert len(snapshot_store) == 2
+
+
+def test_index_jobs_are_not_submitted_while_a_snapshot_is_active(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_DB_PATH", str(tmp_path / "jobs.sqlite3"))
+    import main
+
+    monkeypatch.setenv("POLICY_SNAPSHOT", str(tmp_path / "snapshots"))
+    for name in ("vectorize-policies", "refresh-policies"):
+        with pytest.raises(HTTPException) as refused:
+            main.submit_job(name, Response())
+        assert refused.value.status_code == 409
+    assert main.job_runner.list() == []
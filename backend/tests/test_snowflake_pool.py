@@ -0,0 +1,94 @@
+import threading
+import time
+import pytest
+from snowflake_pool import PoolTimeout, SnowflakePool
+
+
+class FakeCursor:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        time.sleep(self.conn.ping_seconds)
+        if not self.conn.healthy:
+            raise RuntimeError("session expired")
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+
+    def __init__(self, ping_seconds=0.0, healthy=True):
+        self.ping_seconds = ping_seconds
+        self.healthy = healthy
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def rollback(self):
+        pass
+
+
+def test_health_checks_do_not_block_other_borrowers():
+    pool = SnowflakePool(FakeConnection, max_size=2, health_check_interval=0.001, acquire_timeout=5)
+    slow, fast = FakeConnection(ping_seconds=0.5), FakeConnection()
+    # The slow one is handed out first (most recently returned)
+    pool.release(fast)
+    pool.release(slow)
+    pool._size = 2
+    time.sleep(0.01)
+
+    borrowed = {}
+
+    def borrow(name):
+        start = time.monotonic()
+        borrowed[name] = (pool.acquire(), time.monotonic() - start)
+
+    first = threading.Thread(target=borrow, args=("first",))
+    first.start()
+    time.sleep(0.05)
+    borrow("second")
+    first.join()
+
+    assert borrowed["first"][0] is slow
+    assert borrowed["second"][0] is fast
+    assert borrowed["second"][1] < 0.25
+
+
+def test_a_connection_that_fails_its_health_check_is_replaced():
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    pool = SnowflakePool(connect, max_size=1, health_check_interval=0.001, acquire_timeout=1)
+    conn = pool.acquire()
+    conn.healthy = False
+    pool.release(conn)
+    time.sleep(0.01)
+
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    stats = pool.stats()
+    assert (stats["open"], stats["health_check_failures"], stats["created"]) == (1, 1, 2)
+
+
+def test_an_explicit_zero_acquire_timeout_does_not_wait(monkeypatch):
+    monkeypatch.setenv("SNOWFLAKE_POOL_ACQUIRE_TIMEOUT", "30")
+    pool = SnowflakePool(FakeConnection, max_size=1, acquire_timeout=0)
+    pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - start < 1
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import numpy as np
+
+
+# Vector stores used for policy retrieval. similarity_search and vectorize_policies only talk
+# to the small interface below, so the backend can be switched with the VECTOR_STORE env var:
+#   pinecone - the remote "reddit-policies" Pinecone index (default)
+#   local    - an in-process NumPy matrix persisted to LOCAL_VECTOR_STORE_PATH
+
+DEFAULT_LOCAL_PATH = "reddit_policies_index.npz"
+
+
+class VectorStore:
+
+    def ensure_index(self, dimension):
+        # Make sure the underlying index exists and accepts vectors of this dimension
+        pass
+
+    def upsert(self, items):
+        # items is a list of (id, vector) or (id, vector, metadata) tuples
+        raise NotImplementedError
+
+    def query(self, vector, top_k):
+        # Returns a list of {'id': ..., 'score': ...} dicts, best match first, with a
+        # 'metadata' entry for items that were upserted with one
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def save(self):
+        pass
+
+
+class LocalVectorStore(VectorStore):
+
+    def __init__(self, path=DEFAULT_LOCAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # (ids, matrix) is swapped as a whole on every write so queries never need the lock
+        self._data = ([], np.zeros((0, 0), dtype=np.float32))
+        self._metadata = {}
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self._data[0])
+
+    @staticmethod
+    def _normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def ensure_index(self, dimension):
+        ids, matrix = self._data
+        if len(ids) and matrix.shape[1] != dimension:
+            raise ValueError(f"Local index has dimension {matrix.shape[1]}, got {dimension}")
+
+    def upsert(self, items):
+        if not items:
+            return
+
+        new_ids = [item[0] for item in items]
+        new_vectors = self._normalize([item[1] for item in items])
+
+        with self._lock:
+            for item in items:
+                if len(item) > 2:
+                    self._metadata[item[0]] = item[2]
+
+            ids, matrix = self._data
+            ids = list(ids)
+            matrix = matrix.copy() if len(ids) else np.zeros((0, new_vectors.shape[1]), dtype=np.float32)
+            positions = {item_id: row for row, item_id in enumerate(ids)}
+
+            appended_ids = []
+            appended_rows = []
+            for item_id, vector in zip(new_ids, new_vectors):
+                if item_id in positions:
+                    matrix[positions[item_id]] = vector
+                else:
+                    positions[item_id] = len(ids) + len(appended_ids)
+                    appended_ids.append(item_id)
+                    appended_rows.append(vector)
+
+            if appended_rows:
+                matrix = np.vstack([matrix, np.stack(appended_rows)])
+                ids.extend(appended_ids)
+
+            self._data = (ids, matrix)
+
+    def query(self, vector, top_k):
+        ids, matrix = self._data
+        if not ids:
+            return []
+
+        query_vector = self._normalize(vector)
+        # Rows are unit length, so one matrix-vector product gives every cosine similarity
+        scores = matrix @ query_vector
+
+        top_k = min(top_k, len(ids))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for row in top:
+            match = {'id': ids[row], 'score': float(scores[row])}
+            if ids[row] in self._metadata:
+                match['metadata'] = self._metadata[ids[row]]
+            matches.append(match)
+        return matches
+
+    def delete(self, ids):
+        to_delete = set(ids)
+        with self._lock:
+            current_ids, matrix = self._data
+            keep = [row for row, item_id in enumerate(current_ids) if item_id not in to_delete]
+            self._data = ([current_ids[row] for row in keep], matrix[keep])
+            for item_id in to_delete:
+                self._metadata.pop(item_id, None)
+
+    def save(self):
+        ids, matrix = self._data
+        # Write to a temporary file first so a reader never sees a half-written index
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, ids=np.array(ids, dtype=str), vectors=matrix, metadata=np.array(json.dumps(self._metadata)))
+        os.replace(tmp_path, self.path)
+        print(f"Saved {len(ids)} vectors to '{self.path}'")
+
+    def load(self):
+        with np.load(self.path) as data:
+            ids = [str(item_id) for item_id in data['ids']]
+            matrix = data['vectors'].astype(np.float32)
+            metadata = json.loads(str(data['metadata'])) if 'metadata' in data else {}
+        self._data = (ids, matrix)
+        self._metadata = metadata
+        print(f"Loaded {len(ids)} vectors from '{self.path}'")
+
+
+class PineconeVectorStore(VectorStore):
+
+    def __init__(self, index_name):
+        # Pinecone is optional: only needed when this backend is selected
+        from pinecone import Pinecone
+
+        self.index_name = index_name
+        self.pc = Pinecone(api_key=os.getenv('PINECONE_API_KEY'))
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = self.pc.Index(name=self.index_name)
+        return self._index
+
+    def ensure_index(self, dimension):
+        from pinecone import ServerlessSpec
+
+        # Check if index exists, if not create one
+        if self.index_name not in self.pc.list_indexes().names():
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=dimension,
+                metric='cosine',
+                spec=ServerlessSpec(
+                    cloud='aws',
+                    region=os.getenv('PINECONE_ENV')
+                )
+            )
+            self._index = None
+
+    def upsert(self, items):
+        self.index.upsert(vectors=items)
+
+    def query(self, vector, top_k):
+        result = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
+        matches = []
+        for match in result['matches']:
+            item = {'id': match['id'], 'score': match['score']}
+            if match.get('metadata'):
+                item['metadata'] = match['metadata']
+            matches.append(item)
+        return matches
+
+    def delete(self, ids):
+        self.index.delete(ids=list(ids))
+
+
+def create_vector_store(index_name):
+    backend = os.getenv("VECTOR_STORE", "pinecone").lower()
+
+    if backend == "local":
+        return LocalVectorStore(os.getenv("LOCAL_VECTOR_STORE_PATH", DEFAULT_LOCAL_PATH))
+    elif backend == "pinecone":
+        return PineconeVectorStore(index_name)
+    else:
+        raise ValueError(f"Unknown VECTOR_STORE '{backend}', expected 'local' or 'pinecone'")
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+# Two-tier cache for moderation verdicts, so reposts, cross-posts, bot spam and pipeline reruns
+# don't pay for another completion / Assistants run / moderation call.
+#   tier 1 - in-process LRU
+#   tier 2 - SQLite file shared by the API and the Mage workers on the same host
+# Entries are keyed by a hash of (namespace, policy version, normalized text), so publishing a
+# new policy version never serves verdicts made against the old policies.
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".safefeed", "verdict_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 4096
+DEFAULT_DISK_ENTRIES = 200000
+
+# Run disk eviction once every this many writes
+EVICT_EVERY = 500
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    text = unicodedata.normalize("NFKC", text or "")
+    return _whitespace.sub(" ", text).strip().lower()
+
+
+def cache_key(namespace, text, policy_version):
+    payload = f"{namespace}\0{policy_version}\0{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+
+    def __init__(self, path=None, ttl=None, memory_entries=None, disk_entries=None):
+        self.path = path if path is not None else os.getenv("VERDICT_CACHE_PATH", DEFAULT_PATH)
+        self.ttl = ttl if ttl is not None else float(os.getenv("VERDICT_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        # 0 is a valid size (nothing is kept in that tier), so only None falls back to the settings
+        self.memory_entries = (memory_entries if memory_entries is not None
+                               else int(os.getenv("VERDICT_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)))
+        self.disk_entries = (disk_entries if disk_entries is not None
+                             else int(os.getenv("VERDICT_CACHE_DISK_ENTRIES", DEFAULT_DISK_ENTRIES)))
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._conn = None
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # One connection per process, guarded by self._lock; WAL lets the API and the
+            # Mage workers read and write the same file concurrently
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS verdicts (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT,
+                    value TEXT,
+                    expires_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_expires_at ON verdicts (expires_at)")
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, namespace, text, policy_version):
+        key = cache_key(namespace, text, policy_version)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM verdicts WHERE key = ? AND expires_at > ?", (key, now)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, namespace, text, policy_version, value):
+        key = cache_key(namespace, text, policy_version)
+        expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["writes"] += 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, namespace, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, namespace, json.dumps(value), expires_at)
+                )
+                self._writes += 1
+                if self._writes % EVICT_EVERY == 0:
+                    self._evict_disk()
+
+    def _evict_disk(self):
+        self._conn.execute("DELETE FROM verdicts WHERE expires_at <= ?", (time.time(),))
+        # Over the size limit: drop the entries closest to expiry, i.e. the oldest writes
+        self._conn.execute("""
+            DELETE FROM verdicts WHERE key IN (
+                SELECT key FROM verdicts ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.disk_entries,))
+
+    def get_or_compute(self, namespace, text, policy_version, compute):
+        value = self.get(namespace, text, policy_version)
+        if value is None:
+            value = compute()
+            self.set(namespace, text, policy_version, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else None
+        return stats
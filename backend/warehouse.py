@@ -0,0 +1,108 @@
+import os
+from policy_store import PolicyStore
+from snowflake_pool import SnowflakePool
+
+
+# Snowflake access shared by the API and the admin jobs: the pooled sessions, the policy tables
+# and the in-process copy of REDDIT_POLICIES. The connector itself is only imported when the
+# first session is opened.
+
+
+def connect_snowflake():
+    import snowflake.connector
+
+    # Connection parameters
+    account = os.getenv("SNOWFLAKE_ACCOUNT")
+    user = os.getenv("SNOWFLAKE_USER")
+    password = os.getenv("SNOWFLAKE_PASSWORD")
+    database = os.getenv("SNOWFLAKE_DATABASE")
+    schema = os.getenv("SNOWFLAKE_SCHEMA")
+    table_name = "REDDIT_POLICIES"
+
+    # Establishing connection
+    conn = snowflake.connector.connect(
+        user=user,
+        password=password,
+        account=account,
+        database=database,
+        schema=schema
+    )
+
+    return conn, table_name
+
+
+
+def disconnect_snowflake(cur, conn):
+    cur.close()
+    conn.close()
+
+
+
+# Shared, pooled Snowflake sessions; helpers borrow a cursor instead of opening a session each call
+POLICY_TABLE = "REDDIT_POLICIES"
+
+snowflake_pool = SnowflakePool(lambda: connect_snowflake()[0])
+
+
+
+# Single-row table holding the id of the policy set currently in REDDIT_POLICIES.
+# upload_policies_to_snowflake writes a new id so every API process knows to reload.
+POLICY_VERSION_TABLE = "REDDIT_POLICIES_VERSION"
+
+
+def load_policy_table():
+    with snowflake_pool.cursor() as cur:
+        cur.execute(f"SELECT key, value FROM {POLICY_TABLE}")
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def load_policy_version():
+    from snowflake.connector.errors import ProgrammingError
+
+    with snowflake_pool.cursor() as cur:
+        try:
+            cur.execute(f"SELECT version FROM {POLICY_VERSION_TABLE} LIMIT 1")
+        except ProgrammingError:
+            # The version table is only created by the first upload
+            return None
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def create_policy_store():
+    # A local policy snapshot (snapshot.py) stands in for the table when POLICY_SNAPSHOT is set
+    if os.getenv("POLICY_SNAPSHOT"):
+        import snapshot
+
+        return snapshot.SnapshotPolicyStore()
+    return PolicyStore(load_policy_table, load_policy_version)
+
+
+policy_store = create_policy_store()
+
+
+def create_policy_tables(cur):
+    # DDL commits implicitly in Snowflake, so this runs before any transaction starts
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {POLICY_TABLE} (
+        key VARCHAR(255),
+        value VARCHAR(65535)
+    );
+    """)
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {POLICY_VERSION_TABLE} (version VARCHAR(64), updated_at TIMESTAMP_NTZ)")
+
+
+def publish_policy_version(cur, version):
+    cur.execute(f"DELETE FROM {POLICY_VERSION_TABLE}")
+    cur.execute(f"INSERT INTO {POLICY_VERSION_TABLE} (version, updated_at) VALUES (%s, CURRENT_TIMESTAMP())", (version,))
+
+
+def iter_policies(cur, table_name, fetch_size=500):
+    # Stream (key, value) rows from the warehouse instead of fetching them all at once
+    cur.execute(f"SELECT key, value FROM {table_name}")
+    while True:
+        rows = cur.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield row[0], row[1]
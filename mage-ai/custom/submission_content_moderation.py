@@ -9,6 +9,9 @@ import json
 import os
 import re
 import requests
+from utils import safefeed_backend  # makes backend/ importable
+from utils import pre_classifier
+from verdict_cache import VerdictCache
 
 
 if 'custom' not in globals():
@@ -21,6 +24,9 @@ api_key = get_secret_value('OPENAI_API_KEY')
 assistant_id = get_secret_value('OPENAI_ASSISTANT_ID')
 client = OpenAI(api_key=api_key)
 
+# Assistants verdicts are cached by post text and policy file, shared with the backend
+verdict_cache = VerdictCache()
+
 # reddit = praw.Reddit(
 #     client_id=get_secret_value('REDDIT_CLIENT_ID'),
 #     client_secret=get_secret_value('REDDIT_CLIENT_SECRET'),
@@ -65,9 +71,7 @@ def create_thread():
     thread = client.beta.threads.create()
     return thread.id
 
-def send_message(thread_id, user_input, selected_subreddit_name):
-    file_id = get_file_id(client=client, subreddit_name=selected_subreddit_name)
-
+def send_message(thread_id, user_input, file_id):
     message = client.beta.threads.messages.create(
         thread_id=thread_id,
         role="user",
@@ -76,8 +80,8 @@ def send_message(thread_id, user_input, selected_subreddit_name):
     )
     return message
 
-def analyze_content_text(thread_id, assistant_id, user_input, selected_subreddit_name):
-    message = send_message(thread_id, user_input, selected_subreddit_name)
+def analyze_content_text(thread_id, assistant_id, user_input, file_id):
+    message = send_message(thread_id, user_input, file_id)
     run = client.beta.threads.runs.create(
         thread_id=thread_id,
         assistant_id=assistant_id,
@@ -97,8 +101,8 @@ Remember to be concise and objective in your analysis, focusing solely on whethe
     run = wait_on_run(run, thread_id)
     return run
 
-def analyze_content_image(thread_id, assistant_id, user_input, selected_subreddit_name):
-    message = send_message(thread_id, user_input, selected_subreddit_name)
+def analyze_content_image(thread_id, assistant_id, user_input, file_id):
+    message = send_message(thread_id, user_input, file_id)
     run = client.beta.threads.runs.create(
         thread_id=thread_id,
         assistant_id=assistant_id,
@@ -203,6 +207,13 @@ def extract_information_text(response):
 @custom
 def transform_custom(data:DataFrame, *args, **kwargs):
 
+    # Policy file per subreddit, looked up once per run instead of once per row
+    file_ids = {}
+
+    # Confidently benign posts are cleared locally and never reach the assistant; route_posts
+    # prints its routing report to the block log
+    routes, _ = pre_classifier.route_posts(data)
+
     # Iterate over each row
     # print(data)
     for index, row in data.iterrows():
@@ -267,6 +278,15 @@ def transform_custom(data:DataFrame, *args, **kwargs):
                 
             data.drop(['IMAGE_URL'], axis=1, inplace=True)
 
+        if routes[index] == pre_classifier.CLEAR:
+            data.at[index, 'VIOLATION'] = 'No violations'
+            data.at[index, 'DELETED'] = False
+            data.at[index, 'IS_IMAGE_GENERAL'] = False
+            data.at[index, 'IS_IMAGE_SENSITIVE'] = False
+            data.at[index, 'IS_IMAGE_EXPLICIT'] = False
+            data.at[index, 'IS_QUESTIONABLE'] = False
+            continue
+
         # Check if the submission is flagged or contains image
         # if is_flagged:
 
@@ -291,18 +311,37 @@ def transform_custom(data:DataFrame, *args, **kwargs):
 
         # if file_id:
 
-        thread_id = create_thread()
+        if subreddit_name not in file_ids:
+            file_ids[subreddit_name] = get_file_id(client=client, subreddit_name=subreddit_name)
+        file_id = file_ids[subreddit_name]
 
         if image_caption:
-            text_image_input = f"Title: {row['SUBMISSION_TITLE']}. Text: {row['SUBMISSION_TEXT']}. Image Tags: {image_caption}"
-            run = analyze_content_image(thread_id, assistant_id, text_image_input, subreddit_name)
+            llm_input = f"Title: {row['SUBMISSION_TITLE']}. Text: {row['SUBMISSION_TEXT']}. Image Tags: {image_caption}"
+            cache_namespace = 'assistant_image'
         else:
-            text_input = f"Title: {row['SUBMISSION_TITLE']}. Text: {row['SUBMISSION_TEXT']}"
-            run = analyze_content_text(thread_id, assistant_id, text_input, subreddit_name)
+            llm_input = f"Title: {row['SUBMISSION_TITLE']}. Text: {row['SUBMISSION_TEXT']}"
+            cache_namespace = 'assistant_text'
+
+        # A new policy file or assistant gets a new id, so old verdicts are not reused
+        policy_version = f"{assistant_id}:{file_id}"
+        llm_response = verdict_cache.get(cache_namespace, llm_input, policy_version)
 
-        responses = get_responses(thread_id)
-        llm_response = responses[0] if responses else "No response received from the assistant."
-        client.beta.threads.delete(thread_id)
+        if llm_response is None:
+            thread_id = create_thread()
+
+            if image_caption:
+                run = analyze_content_image(thread_id, assistant_id, llm_input, file_id)
+            else:
+                run = analyze_content_text(thread_id, assistant_id, llm_input, file_id)
+
+            responses = get_responses(thread_id)
+            client.beta.threads.delete(thread_id)
+
+            if responses:
+                llm_response = responses[0]
+                verdict_cache.set(cache_namespace, llm_input, policy_version, llm_response)
+            else:
+                llm_response = "No response received from the assistant."
 
         # Retrieve tags as a dictionary to be put into snowflake
         if image_caption:
@@ -384,6 +423,8 @@ def transform_custom(data:DataFrame, *args, **kwargs):
         #     data.at[index, 'IS_IMAGE_EXPLICIT'] = False
         #     data.at[index, 'IS_QUESTIONABLE'] = False
 
+    print(f"Verdict cache: {verdict_cache.stats()}")
+
     # print("Final",data)
     return data
 
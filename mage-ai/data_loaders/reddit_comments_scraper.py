@@ -6,10 +6,10 @@ import time
 import datetime
 import snowflake.connector
 from mage_ai.data_preparation.shared.secrets import get_secret_value
-import re
-import string
-import emoji
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils import safefeed_backend  # makes backend/ importable
+from utils import preprocessing, sentiment
+from utils.moderation_client import ModerationBatcher
+from verdict_cache import VerdictCache
 
 if 'data_loader' not in globals():
     from mage_ai.data_preparation.decorators import data_loader
@@ -27,16 +27,18 @@ reddit = praw.Reddit(
 OPENAI_API_KEY = get_secret_value('OPENAI_API_KEY')
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Shared verdict cache for the ModerationBatcher (see utils/moderation_client.py)
+verdict_cache = VerdictCache()
+
 processed_comments = set()
 
 # Function to get comments recursively
-def get_comments(submission_id, comment, level=0, replied_to=None):
+def get_comments(submission_id, comment, moderation, level=0, replied_to=None):
     comments_data = []
     replies = comment.replies
     for reply in replies:
         if isinstance(reply, praw.models.MoreComments):
             continue
-        preprocessed_comment = preprocess_text(reply.body)
         comment_data = {
             'COMMENT_ID': reply.id,
             'SUBMISSION_ID': submission_id,
@@ -45,73 +47,21 @@ def get_comments(submission_id, comment, level=0, replied_to=None):
             'COMMENT_TEXT': reply.body,
             'REPLIED_TO': replied_to,
             'LEVEL': level,
-            'SENTIMENT_CATEGORY': get_sentiment(preprocessed_comment),
-            **get_openai_moderation_categories(reply.body)
+            'SENTIMENT_CATEGORY': None,  # scored for all comments in load_data
         }
+        moderation.add(reply.body, comment_data)
         comments_data.append(comment_data)
-        comments_data.extend(get_comments(submission_id, reply, level + 1, replied_to=reply.author.name if reply.author else '[deleted]'))
+        comments_data.extend(get_comments(submission_id, reply, moderation, level + 1, replied_to=reply.author.name if reply.author else '[deleted]'))
         processed_comments.add(reply.id)
     return comments_data
 
-def get_openai_moderation_categories(text):
-    response = openai_client.moderations.create(input=text)
-    categories = response.results[0].categories
-    
-    # Extract relevant category information
-    category_dict = {
-        'harassment': categories.harassment,
-        'harassment_threatening': categories.harassment_threatening,
-        'hate': categories.hate,
-        'hate_threatening': categories.hate_threatening,
-        'self_harm': categories.self_harm,
-        'self_harm_instructions': categories.self_harm_instructions,
-        'self_harm_intent': categories.self_harm_intent,
-        'sexual': categories.sexual,
-        'sexual_minors': categories.sexual_minors,
-        'violence': categories.violence,
-        'violence_graphic': categories.violence_graphic,
-        'IS_FLAGGED': response.results[0].flagged  # Add flagged attribute
-    }
-    return category_dict
-
-def replace_emojis(text):
-    return emoji.demojize(text, delimiters=(" ", " "))
-
-def preprocess_text(text):
-
-    # Lowercase the text
-    text = text.lower()
-    # Remove URLs
-    text = re.sub(r'http\S+', '', text)
-    # Remove special characters and punctuation
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    # Replace emojis with their descriptions
-    text = replace_emojis(text)
-
-    return text
-
-def get_sentiment(text):
-    analyzer = SentimentIntensityAnalyzer()
-    sentiment_scores = analyzer.polarity_scores(text)
-
-    # print(sentiment_scores)
-
-    # Use custom threshold values if needed
-    if sentiment_scores['compound'] > 0:
-        return "Positive"
-    elif sentiment_scores['compound'] < 0:
-        return "Negative"
-    else:
-        return "Neutral"
-
-def update_last_trigger_timestamp(conn, submission_id):
+def update_last_trigger_timestamp(conn, submission_id, last_trigger):
     cursor = conn.cursor()
-    current_time = time.time()
     cursor.execute("""
         UPDATE SAFE_FEED.REDDIT.SUBMISSION 
         SET LAST_TRIGGER_TIMESTAMP = TO_TIMESTAMP(%s)
         WHERE SUBMISSION_ID = %s
-    """, (current_time, submission_id))
+    """, (last_trigger, submission_id))
     conn.commit()
 
 @data_loader
@@ -133,42 +83,56 @@ def load_data(data: pd.DataFrame, *args, **kwargs):
 
     comments_data = []
 
-    # Loop through each subreddit
-    for submission_id, subreddit_id, last_trigger in submissions:
-
-        # Get submission object
-        submission = reddit.submission(id=submission_id)
-        last_trigger_timestamp = last_trigger.timestamp()
-        # if not data.empty:
-        #     last_trigger_timestamp = data['last_trigger'][0]
-        
-        # Iterate over comments in submission
-        submission.comments.replace_more(limit=None)
-        for comment in submission.comments.list():
-            if comment.id not in processed_comments:  # Check if comment has not been processed
-                # Check if comment is newer than last trigger timestamp
-                if comment.created_utc > last_trigger_timestamp:
-                    preprocessed_comment = preprocess_text(comment.body)
-                    comment_data = {
-                        'COMMENT_ID': comment.id,
-                        'SUBMISSION_ID': submission_id,
-                        'COMMENT_TEXT': comment.body,
-                        'COMMENT_AUTHOR': comment.author.name if comment.author else '[deleted]',
-                        'COMMENT_TIMESTAMP': comment.created_utc,
-                        'REPLIED_TO': submission.author.name if submission.author else '[deleted]',
-                        'LEVEL': 0,
-                        'SENTIMENT_CATEGORY': get_sentiment(preprocessed_comment),
-                        **get_openai_moderation_categories(comment.body)
-                    }
-                    comments_data.append(comment_data)
-                    comments_data.extend(get_comments(submission_id, comment, level=1, replied_to=comment.author.name if comment.author else '[deleted]'))
-                processed_comments.add(comment.id)  # Add comment to processed set
-
-        update_last_trigger_timestamp(conn, submission_id)
-           
+    # Comments are moderated in multi-input batches while the threads are walked
+    with ModerationBatcher(openai_client, cache=verdict_cache) as moderation:
+        # Loop through each subreddit
+        for submission_id, subreddit_id, last_trigger in submissions:
+
+            # Get submission object
+            submission = reddit.submission(id=submission_id)
+            last_trigger_timestamp = last_trigger.timestamp()
+            # if not data.empty:
+            #     last_trigger_timestamp = data['last_trigger'][0]
+
+            # Iterate over comments in submission
+            submission.comments.replace_more(limit=None)
+            for comment in submission.comments.list():
+                if comment.id not in processed_comments:  # Check if comment has not been processed
+                    # Check if comment is newer than last trigger timestamp
+                    if comment.created_utc > last_trigger_timestamp:
+                        comment_data = {
+                            'COMMENT_ID': comment.id,
+                            'SUBMISSION_ID': submission_id,
+                            'COMMENT_TEXT': comment.body,
+                            'COMMENT_AUTHOR': comment.author.name if comment.author else '[deleted]',
+                            'COMMENT_TIMESTAMP': comment.created_utc,
+                            'REPLIED_TO': submission.author.name if submission.author else '[deleted]',
+                            'LEVEL': 0,
+                            'SENTIMENT_CATEGORY': None,
+                        }
+                        moderation.add(comment.body, comment_data)
+                        comments_data.append(comment_data)
+                        comments_data.extend(get_comments(submission_id, comment, moderation, level=1, replied_to=comment.author.name if comment.author else '[deleted]'))
+                    processed_comments.add(comment.id)  # Add comment to processed set
+
+        # Waits for the last batches; every comment now has its categories
+        moderation.flush()
+
+    # Only once every batch is moderated: if a request fails, the next run picks the comments up again.
+    # The watermark is the newest comment loaded, like the submission loader's, so a comment posted
+    # during the walk is loaded once: now if it was fetched, next run otherwise.
+    newest_comments = {}
+    for comment_data in comments_data:
+        submission_id = comment_data['SUBMISSION_ID']
+        newest_comments[submission_id] = max(newest_comments.get(submission_id, 0), comment_data['COMMENT_TIMESTAMP'])
+    for submission_id, newest_comment in newest_comments.items():
+        update_last_trigger_timestamp(conn, submission_id, newest_comment)
 
     # Create DataFrame from comments data
     df_comments = pd.DataFrame(comments_data)
+    if not df_comments.empty:
+        # One VADER pass over every comment (split across processes for large runs, see utils/sentiment)
+        df_comments['SENTIMENT_CATEGORY'] = sentiment.score_series(preprocessing.preprocess_series(df_comments['COMMENT_TEXT']))
 
     conn.close()
 
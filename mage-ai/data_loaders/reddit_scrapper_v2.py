@@ -4,109 +4,52 @@ from openai import OpenAI
 from gradio_client import Client
 from dotenv import load_dotenv
 import os
-import re
+import json
 import time
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import snowflake.connector
 from mage_ai.data_preparation.shared.secrets import get_secret_value
-import string
-import emoji
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from utils import safefeed_backend  # makes backend/ importable
+from utils import preprocessing, sentiment
+from utils.moderation_client import ModerationBatcher
+from utils.reddit_rate_limit import ThrottledRequestor, request_stats
+from verdict_cache import VerdictCache
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Initialize PRAW 
 API_KEY = get_secret_value('REDDIT_API_KEY')
-reddit = praw.Reddit(
-    client_id=get_secret_value('REDDIT_CLIENT_ID'),
-    client_secret=get_secret_value('REDDIT_CLIENT_SECRET'),
-    user_agent=get_secret_value('REDDIT_USER_AGENT')
-)
+REDDIT_CLIENT_ID = get_secret_value('REDDIT_CLIENT_ID')
+REDDIT_CLIENT_SECRET = get_secret_value('REDDIT_CLIENT_SECRET')
+REDDIT_USER_AGENT = get_secret_value('REDDIT_USER_AGENT')
+
+# Subreddits loaded at the same time. All of them share one Reddit rate limit (reddit_rate_limit).
+INGEST_CONCURRENCY = int(os.getenv('INGEST_CONCURRENCY', '4'))
+
+reddit_local = threading.local()
+
+def get_reddit():
+    # PRAW is not thread safe, so every ingestion worker has its own instance
+    if not hasattr(reddit_local, 'reddit'):
+        reddit_local.reddit = praw.Reddit(
+            client_id=REDDIT_CLIENT_ID,
+            client_secret=REDDIT_CLIENT_SECRET,
+            user_agent=REDDIT_USER_AGENT,
+            requestor_class=ThrottledRequestor
+        )
+    return reddit_local.reddit
 
 # Initialize OpenAI client
 OPENAI_API_KEY = get_secret_value('OPENAI_API_KEY')
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
 
-gradio_client = Client("SmilingWolf/wd-tagger")
+# Shared verdict cache for the ModerationBatcher (see utils/moderation_client.py)
+verdict_cache = VerdictCache()
 
-def replace_emojis(text):
-    return emoji.demojize(text, delimiters=(" ", " "))
-
-def preprocess_text(text):
-
-    # Lowercase the text
-    text = text.lower()
-    # Remove URLs
-    text = re.sub(r'http\S+', '', text)
-    # Remove special characters and punctuation
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    # Replace emojis with their descriptions
-    text = replace_emojis(text)
-
-    return text
-
-def get_sentiment(text):
-    analyzer = SentimentIntensityAnalyzer()
-    sentiment_scores = analyzer.polarity_scores(text)
-
-    # print(sentiment_scores)
-
-    # Use custom threshold values if needed
-    if sentiment_scores['compound'] > 0:
-        return "Positive"
-    elif sentiment_scores['compound'] < 0:
-        return "Negative"
-    else:
-        return "Neutral"
-
-def get_openai_moderation_categories(text):
-    response = openai_client.moderations.create(input=text)
-    categories = response.results[0].categories
-    
-    # Extract relevant category information
-    category_dict = {
-        'harassment': categories.harassment,
-        'harassment_threatening': categories.harassment_threatening,
-        'hate': categories.hate,
-        'hate_threatening': categories.hate_threatening,
-        'self_harm': categories.self_harm,
-        'self_harm_instructions': categories.self_harm_instructions,
-        'self_harm_intent': categories.self_harm_intent,
-        'sexual': categories.sexual,
-        'sexual_minors': categories.sexual_minors,
-        'violence': categories.violence,
-        'violence_graphic': categories.violence_graphic,
-        'IS_FLAGGED': response.results[0].flagged  # Add flagged attribute
-    }
-    return category_dict
-
-# def extract_image_url(text):
-#     # Regular expression pattern to match complete image URLs
-#     pattern = r"https?://\S+"
-#     match = re.search(pattern, text)
-#     if match:
-#         url = match.group()
-#         # Check if the URL contains any of the specified image extensions
-#         if any(ext in url.lower() for ext in ['jpg', 'jpeg', 'png', 'gif']):
-#             return url
-#     return None
-def extract_image_url(text):
-    # Regular expression pattern to match complete image URLs
-    pattern = r"https?://[^\s\[\]]+\.(?:jpg|jpeg|png|gif)(?=\s|\[|\])"
-    match = re.search(pattern, text)
-    if match:
-        url = match.group()
-        return url
-    else:
-        pattern = r"https?://\S+"
-        match = re.search(pattern, text)
-        if match:
-            url = match.group()
-            # Check if the URL contains any of the specified image extensions
-            if any(ext in url.lower() for ext in ['jpg', 'jpeg', 'png', 'gif']):
-                return url
-    return None
+gradio_client = Client("SmilingWolf/wd-tagger")
 
 def predict_image_tags(image_url):
     result = gradio_client.predict(image_url, "SmilingWolf/wd-swinv2-tagger-v3", 0.35, False, 0.85, False, api_name="/predict")
@@ -114,15 +57,29 @@ def predict_image_tags(image_url):
     return tags
 
 def get_data(subreddit_id, subreddit_name, last_trigger_timestamp):
-    posts_data = []
     # Convert last_trigger_timestamp to Unix timestamp
     last_trigger_timestamp = last_trigger_timestamp.timestamp()
 
-    for submission in reddit.subreddit(subreddit_name).new():
+    # Posts are moderated in multi-input batches while the rest of the subreddit is scraped
+    with ModerationBatcher(openai_client, cache=verdict_cache) as moderation:
+        posts_data = get_posts(subreddit_id, subreddit_name, last_trigger_timestamp, moderation)
+        moderation.flush()
+
+    df_posts = pd.DataFrame(posts_data)
+    if not df_posts.empty:
+        # One VADER pass over every post, with the lexicon loaded once per process
+        post_texts = df_posts['SUBMISSION_TITLE'] + ": " + df_posts['SUBMISSION_TEXT']
+        df_posts['SENTIMENT_CATEGORY'] = sentiment.score_series(preprocessing.preprocess_series(post_texts))
+
+    return df_posts
+
+def get_posts(subreddit_id, subreddit_name, last_trigger_timestamp, moderation):
+    posts_data = []
+
+    for submission in get_reddit().subreddit(subreddit_name).new():
         # Check if the submission is newer than the last trigger run
         if submission.created_utc > last_trigger_timestamp:
             post_text = submission.title + ": " + submission.selftext
-            preprocessed_post = preprocess_text(post_text)
             post_data = {
                 'SUBMISSION_ID': submission.id,
                 'SUBREDDIT_ID': subreddit_id,
@@ -132,15 +89,16 @@ def get_data(subreddit_id, subreddit_name, last_trigger_timestamp):
                 'SUBMISSION_AUTHOR': submission.author.name if submission.author else '[deleted]',
                 'SUBMISSION_TIMESTAMP': submission.created_utc,
                 'SUBMISSION_TEXT': submission.selftext,
-                'SENTIMENT_CATEGORY': get_sentiment(preprocessed_post),
+                'SENTIMENT_CATEGORY': None,  # scored for the whole subreddit in get_data
                 'LAST_TRIGGER_TIMESTAMP': submission.created_utc,
-                **get_openai_moderation_categories(post_text)  # Add OpenAI moderation categories
             }
+            # Add OpenAI moderation categories (filled in by moderation.flush())
+            moderation.add(post_text, post_data)
 
             # Check if the post contains an image URL in the text
             # print(submission.selftext)
             try:
-                image_url = extract_image_url(submission.selftext)
+                image_url = preprocessing.extract_image_url(submission.selftext)
                 if image_url:
                     # print("if", image_url)
                     image_tags = predict_image_tags(image_url)
@@ -170,7 +128,14 @@ def get_data(subreddit_id, subreddit_name, last_trigger_timestamp):
 
             posts_data.append(post_data)
 
-    return pd.DataFrame(posts_data)
+    return posts_data
+
+def ingest_subreddit(subreddit_id, subreddit_name, last_trigger_timestamp):
+    # Runs on an ingestion worker; returns the posts and this subreddit's report
+    start = time.perf_counter()
+    with request_stats() as stats:
+        df_posts = get_data(subreddit_id=subreddit_id, subreddit_name=subreddit_name, last_trigger_timestamp=last_trigger_timestamp)
+    return df_posts, {'posts': len(df_posts), 'fetch_seconds': time.perf_counter() - start, **stats}
 
 def update_last_trigger_timestamp(conn, subreddit_name):
     cursor = conn.cursor()
@@ -198,18 +163,51 @@ def load_data(*args, **kwargs):
     cursor.execute("SELECT SUBREDDIT_ID, SUBREDDIT_NAME, LAST_TRIGGER_TIMESTAMP FROM REDDIT.SUBREDDIT")
     subreddits = cursor.fetchall()
 
-    all_posts = []
-
-    # Loop through each subreddit
-    for subreddit_id, subreddit_name, last_trigger_timestamp in subreddits:
-        # Call load_data() function with the subreddit name and last trigger timestamp
-        df_posts = get_data(subreddit_id=subreddit_id, subreddit_name=subreddit_name, last_trigger_timestamp=last_trigger_timestamp)
-        all_posts.append(df_posts)
-        # Update LAST_TRIGGER_TIMESTAMP in Snowflake
-        update_last_trigger_timestamp(conn, subreddit_name)
-
-
-    df_all_posts = pd.concat(all_posts, ignore_index=True)
+    all_posts = {}
+    reports = {}
+    start = time.perf_counter()
+
+    # Subreddits are loaded concurrently; the Snowflake updates stay on this thread
+    with ThreadPoolExecutor(max_workers=INGEST_CONCURRENCY, thread_name_prefix='ingest') as pool:
+        futures = {
+            pool.submit(ingest_subreddit, subreddit_id, subreddit_name, last_trigger_timestamp): subreddit_name
+            for subreddit_id, subreddit_name, last_trigger_timestamp in subreddits
+        }
+        for future in as_completed(futures):
+            subreddit_name = futures[future]
+            try:
+                all_posts[subreddit_name], reports[subreddit_name] = future.result()
+            except Exception as e:
+                # The other subreddits are still stored; this one is retried from the same point next run
+                print(f"Failed to load r/{subreddit_name}: {e}")
+                reports[subreddit_name] = {'posts': 0, 'error': str(e) or type(e).__name__}
+                continue
+            # Update LAST_TRIGGER_TIMESTAMP in Snowflake
+            update_last_trigger_timestamp(conn, subreddit_name)
+
+    if subreddits and not all_posts:
+        raise RuntimeError(f"Every subreddit failed to load: {reports}")
+
+    # Same row order as the sequential loader: subreddits in table order
+    ordered = [all_posts[name] for _, name, _ in subreddits if name in all_posts]
+    df_all_posts = pd.concat(ordered, ignore_index=True) if ordered else pd.DataFrame()
+
+    # Per-subreddit fetch latency and item counts, in the block logs (the output stays a plain
+    # DataFrame for the exporters)
+    ingestion_report = {
+        'concurrency': INGEST_CONCURRENCY,
+        'seconds': time.perf_counter() - start,
+        'subreddits': reports,
+    }
+    for name, report in reports.items():
+        if 'error' in report:
+            print(f"r/{name}: failed ({report['error']})")
+        else:
+            print(f"r/{name}: {report['posts']} posts in {report['fetch_seconds']:.2f}s, "
+                  f"{report['api_requests']} API requests, {report['rate_limit_wait_seconds']:.2f}s rate limited")
+    print(f"Loaded {len(df_all_posts)} posts from {len(all_posts)}/{len(subreddits)} subreddits "
+          f"in {ingestion_report['seconds']:.2f}s")
+    print(f"Ingestion report: {json.dumps(ingestion_report, default=str)}")
 
     # df_all_posts['last_trigger'] =  last_trigger_timestamp
 
@@ -0,0 +1,114 @@
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+import emoji
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import preprocessing  # noqa: E402
+
+
+# Throughput of utils.preprocessing on synthetic short posts, against the per-row functions the
+# loaders used to define (copied below unchanged). Checks that both give exactly the same output
+# and exits non-zero if they don't.
+#
+#   python mage-ai/utils/bench_preprocessing.py --texts 1000000
+
+
+def replace_emojis(text):
+    return emoji.demojize(text, delimiters=(" ", " "))
+
+
+def per_row_preprocess_text(text):
+
+    # Lowercase the text
+    text = text.lower()
+    # Remove URLs
+    text = re.sub(r'http\S+', '', text)
+    # Remove special characters and punctuation
+    text = text.translate(str.maketrans('', '', string.punctuation))
+    # Replace emojis with their descriptions
+    text = replace_emojis(text)
+
+    return text
+
+
+def per_row_extract_image_url(text):
+    # Regular expression pattern to match complete image URLs
+    pattern = r"https?://[^\s\[\]]+\.(?:jpg|jpeg|png|gif)(?=\s|\[|\])"
+    match = re.search(pattern, text)
+    if match:
+        url = match.group()
+        return url
+    else:
+        pattern = r"https?://\S+"
+        match = re.search(pattern, text)
+        if match:
+            url = match.group()
+            # Check if the URL contains any of the specified image extensions
+            if any(ext in url.lower() for ext in ['jpg', 'jpeg', 'png', 'gif']):
+                return url
+    return None
+
+
+WORDS = [
+    'The', 'mods', 'BANNED', 'me', 'again!!', 'lol', "can't", 'believe', 'this', 'thread', '...', 'Great',
+    'post,', 'thanks', '(seriously)', 'worst', 'update', 'ever?', '#1', 'fan', '@here', 'read', 'the', 'rules:',
+]
+EXTRAS = [
+    'https://i.redd.it/abc123.jpg ', '[https://imgur.com/x.png]', 'http://example.com/page?id=7',
+    'https://cdn.site/GIF/cat', '👍', '😂😂', 'café', '🔥 lit', '❤️',
+]
+
+
+def synthetic_texts(count, seed):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 16))
+        # About a third of the posts get a URL or an emoji somewhere
+        if rng.random() < 0.35:
+            words.insert(rng.randint(0, len(words)), rng.choice(EXTRAS))
+        texts.append(' '.join(words) + f' {i}')
+    return texts
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--texts', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = pd.Series(synthetic_texts(args.texts, args.seed))
+    non_ascii = (~texts.map(str.isascii)).mean()
+    print(f"{len(texts)} texts, {non_ascii:.1%} with non-ASCII characters")
+
+    failed = False
+    for name, old, new in [
+        ('preprocess', lambda: [per_row_preprocess_text(text) for text in texts], lambda: preprocessing.preprocess_series(texts)),
+        ('image urls', lambda: [per_row_extract_image_url(text) for text in texts],
+         lambda: pd.Series([preprocessing.extract_image_url(text) for text in texts], dtype=object)),
+    ]:
+        expected, old_seconds = timed(old)
+        actual, new_seconds = timed(new)
+        same = expected == actual.tolist()
+        failed = failed or not same
+        print(f"{name:>10}: per row {len(texts) / old_seconds:,.0f} texts/sec ({old_seconds:.2f}s), "
+              f"utils.preprocessing {len(texts) / new_seconds:,.0f} texts/sec ({new_seconds:.2f}s), "
+              f"{old_seconds / new_seconds:.1f}x; {'identical output' if same else 'OUTPUT DIFFERS'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
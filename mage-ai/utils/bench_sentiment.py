@@ -0,0 +1,89 @@
+import argparse
+import os
+import random
+import sys
+import time
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import sentiment  # noqa: E402
+
+
+# Sentiment scoring of synthetic comments: the old per-row path (a new SentimentIntensityAnalyzer,
+# i.e. a lexicon reload, for every comment) against utils.sentiment.score_series in one process
+# and across a process pool. The per-row path is timed on --per-row-sample comments and
+# extrapolated, since running it on all of them takes many minutes. Exits non-zero if the batched
+# categories differ from the per-row ones.
+#
+#   python mage-ai/utils/bench_sentiment.py --comments 100000 --processes 4
+
+WORDS = [
+    'the', 'a', 'this', 'mod', 'post', 'thread', 'people', 'game', 'update', 'really', 'not', 'very',
+    'love', 'great', 'awesome', 'thanks', 'helpful', 'nice', 'happy', 'funny', 'best', 'good',
+    'hate', 'awful', 'terrible', 'stupid', 'worst', 'angry', 'sad', 'bad', 'useless', 'kill',
+    'maybe', 'today', 'week', 'link', 'source', 'edit', 'lol', 'honestly', 'but', 'and', 'why',
+]
+
+
+def per_row(text):
+    # What the loaders did before: construct the analyzer on every call
+    scores = SentimentIntensityAnalyzer().polarity_scores(text)
+    return sentiment.category(scores['compound'])
+
+
+def synthetic_comments(count, duplicate_ratio, seed):
+    rng = random.Random(seed)
+    comments = []
+    for i in range(count):
+        if comments and rng.random() < duplicate_ratio:
+            comments.append(rng.choice(comments))
+        else:
+            words = rng.choices(WORDS, k=rng.randint(8, 40))
+            comments.append(' '.join(words) + f' {i}')
+    return comments
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--per-row-sample', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help='fraction of comments repeating an earlier one')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    comments = synthetic_comments(args.comments, args.duplicate_ratio, args.seed)
+    sample = comments[:args.per_row_sample]
+
+    start = time.perf_counter()
+    expected = [per_row(text) for text in sample]
+    per_row_rate = len(sample) / (time.perf_counter() - start)
+    print(f"{'per row':>16}: {per_row_rate:.0f} comments/sec "
+          f"(~{args.comments / per_row_rate:.1f}s for {args.comments}, from {len(sample)} comments)")
+
+    runs = [('batched', 1)]
+    if args.processes > 1:
+        runs.append((f'batched x{args.processes}', args.processes))
+    # Always fan out when processes > 1, whatever the batch size, to measure the pool itself
+    sentiment.PROCESS_MIN_ROWS = 0
+
+    failed = False
+    for name, processes in runs:
+        # A fresh process also pays for the first lexicon load; include it once
+        sentiment._analyzer = None
+        start = time.perf_counter()
+        categories = sentiment.score_series(comments, processes=processes)
+        elapsed = time.perf_counter() - start
+
+        same = list(categories[:len(sample)]) == expected
+        failed = failed or not same
+        print(f"{name:>16}: {args.comments / elapsed:.0f} comments/sec ({elapsed:.2f}s, "
+              f"{args.comments / elapsed / per_row_rate:.0f}x per row), dtype {categories.dtype}, "
+              f"{'same categories as per row' if same else 'DIFFERENT categories from per row'}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import math
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils import pre_classifier  # noqa: E402
+
+
+# Picks PRECLASSIFIER_MAX_POLICY_SIMILARITY from posts the LLM has already judged. Every post is
+# routed like utils.pre_classifier would (flagged and image posts never clear) and, for a range of
+# cutoffs, reports how many posts would be cleared and the false-clear rate: the fraction of
+# violating posts that would have skipped the LLM. Recommends the highest cutoff within
+# --max-false-clear-rate, and exits non-zero if the configured cutoff is above it.
+#
+# The labelled posts are an export of SAFE_FEED.REDDIT.SUBMISSION (SUBMISSION_TITLE,
+# SUBMISSION_TEXT, VIOLATION, and IMAGE_CAPTION / the moderation categories if present) from runs
+# with the pre-classifier off, so that every label came from the LLM. Needs RETRIEVAL_MODE=passage
+# and the passage index, like the pre-classifier itself.
+#
+#   RETRIEVAL_MODE=passage python mage-ai/utils/calibrate_pre_classifier.py submissions.csv
+
+CUTOFFS = [round(0.05 * step, 2) for step in range(1, 13)]
+
+
+def is_violation(labels, benign_value):
+    labels = labels.fillna(benign_value).astype(str).str.strip()
+    return (labels != benign_value) & (labels != '')
+
+
+def recommended_cutoff(violating_similarities, max_false_clear_rate):
+    # Highest cutoff (3 decimals) that clears at most max_false_clear_rate of the violating posts
+    if not violating_similarities:
+        return None
+    allowed = math.floor(max_false_clear_rate * len(violating_similarities))
+    ordered = sorted(violating_similarities)
+    if allowed >= len(ordered):
+        return None
+    # A post clears when its similarity is below the cutoff
+    return math.floor(ordered[allowed] * 1000) / 1000
+
+
+def sweep(similarities, violating, cutoffs, rows, violations):
+    results = []
+    for cutoff in cutoffs:
+        cleared = [index for index, similarity in similarities.items() if similarity < cutoff]
+        false_clears = sum(1 for index in cleared if violating[index])
+        results.append({
+            'cutoff': cutoff,
+            'cleared': len(cleared),
+            'cleared_fraction': len(cleared) / rows if rows else 0.0,
+            'false_clears': false_clears,
+            'false_clear_rate': false_clears / violations if violations else None,
+        })
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('labelled_csv')
+    parser.add_argument('--label-column', default='VIOLATION')
+    parser.add_argument('--benign-value', default='No violations',
+                        help='label of posts the LLM found no violation in')
+    parser.add_argument('--max-false-clear-rate', type=float, default=0.005)
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.labelled_csv)
+    violating = is_violation(data[args.label_column], args.benign_value)
+    rows, violations = len(data), int(violating.sum())
+    print(f"{rows} labelled posts, {violations} with a violation")
+    if violations < 100:
+        print(f"Only {violations} violating posts: the false-clear rates below are rough estimates")
+
+    decisions, similarities = pre_classifier.score_posts(data)
+    print(f"{len(decisions)} never cleared (flagged or with an image), {len(similarities)} scored")
+
+    cutoffs = sorted(set(CUTOFFS + [pre_classifier.MAX_POLICY_SIMILARITY]))
+    results = sweep(similarities, violating, cutoffs, rows, violations)
+    print(f"{'cutoff':>8} {'cleared':>16} {'false clears':>14} {'false-clear rate':>17}")
+    for result in results:
+        rate = result['false_clear_rate']
+        configured = '  <- configured' if result['cutoff'] == pre_classifier.MAX_POLICY_SIMILARITY else ''
+        print(f"{result['cutoff']:>8.3f} {result['cleared']:>7} ({result['cleared_fraction']:>6.1%}) "
+              f"{result['false_clears']:>14} {'n/a' if rate is None else f'{rate:.2%}':>17}{configured}")
+
+    recommended = recommended_cutoff([similarity for index, similarity in similarities.items() if violating[index]],
+                                     args.max_false_clear_rate)
+    if recommended is None:
+        print("Not enough scored violating posts to recommend a cutoff")
+    else:
+        print(f"Highest cutoff within a {args.max_false_clear_rate:.2%} false-clear rate: {recommended:.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'rows': rows,
+                'violations': violations,
+                'never_cleared': len(decisions),
+                'max_false_clear_rate': args.max_false_clear_rate,
+                'configured_cutoff': pre_classifier.MAX_POLICY_SIMILARITY,
+                'recommended_cutoff': recommended,
+                'cutoffs': results,
+            }, f, indent=2)
+
+    configured_ok = recommended is not None and pre_classifier.MAX_POLICY_SIMILARITY <= recommended
+    if not configured_ok:
+        print(f"The configured cutoff {pre_classifier.MAX_POLICY_SIMILARITY} is not supported by this data; "
+              f"keep PRECLASSIFIER_ENABLED off or lower PRECLASSIFIER_MAX_POLICY_SIMILARITY")
+    sys.exit(0 if configured_ok else 1)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,132 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils import safefeed_backend  # makes backend/ importable
+from verdict_cache import VerdictCache, cache_key
+
+
+# Batched OpenAI moderation for the submission and comment loaders.
+# The moderation endpoint takes a list of inputs, so instead of one request per post or comment,
+# texts are collected while scraping and sent MODERATION_BATCH_SIZE at a time (also capped at
+# MODERATION_BATCH_CHARS characters per request), with up to MODERATION_CONCURRENCY requests in
+# flight. A batch is sent as soon as it is full, so moderation overlaps with the scraping.
+# Texts already in the verdict cache, or already waiting in this run, are not sent again.
+#
+#   with ModerationBatcher(openai_client) as batcher:
+#       for ...:
+#           row = {...}
+#           batcher.add(text, row)    # adds the category columns to row (None until flushed)
+#       batcher.flush()               # every row now has its categories
+
+# The model is part of the cache key, so cached categories are only reused for the same model
+MODERATION_MODEL = 'text-moderation-latest'
+
+BATCH_SIZE = int(os.getenv('MODERATION_BATCH_SIZE', '32'))
+BATCH_CHARS = int(os.getenv('MODERATION_BATCH_CHARS', '32000'))
+CONCURRENCY = int(os.getenv('MODERATION_CONCURRENCY', '4'))
+
+CATEGORY_COLUMNS = [
+    'harassment', 'harassment_threatening', 'hate', 'hate_threatening', 'self_harm',
+    'self_harm_instructions', 'self_harm_intent', 'sexual', 'sexual_minors', 'violence',
+    'violence_graphic', 'IS_FLAGGED',
+]
+
+
+def category_dict(result):
+    # One moderation result -> the category columns stored with each post / comment
+    categories = result.categories
+    return {
+        'harassment': categories.harassment,
+        'harassment_threatening': categories.harassment_threatening,
+        'hate': categories.hate,
+        'hate_threatening': categories.hate_threatening,
+        'self_harm': categories.self_harm,
+        'self_harm_instructions': categories.self_harm_instructions,
+        'self_harm_intent': categories.self_harm_intent,
+        'sexual': categories.sexual,
+        'sexual_minors': categories.sexual_minors,
+        'violence': categories.violence,
+        'violence_graphic': categories.violence_graphic,
+        'IS_FLAGGED': result.flagged,
+    }
+
+
+class ModerationBatcher:
+
+    def __init__(self, openai_client, cache=None, batch_size=BATCH_SIZE, batch_chars=BATCH_CHARS,
+                 concurrency=CONCURRENCY):
+        self.openai_client = openai_client
+        self.cache = cache if cache is not None else VerdictCache()
+        self.batch_size = batch_size
+        self.batch_chars = batch_chars
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='moderation')
+
+        # Rows waiting for each text (keyed like the cache, so identical texts are sent once)
+        self._waiting = {}
+        self._pending = []
+        self._pending_chars = 0
+        self._futures = []
+        self.stats = {'texts': 0, 'cache_hits': 0, 'duplicates': 0, 'sent': 0, 'requests': 0}
+        self._start = time.perf_counter()
+
+    def add(self, text, row):
+        row.update(dict.fromkeys(CATEGORY_COLUMNS))
+        self.stats['texts'] += 1
+
+        # Reruns, reposts and spam waves often resend the exact same text
+        cached_categories = self.cache.get('moderation', text, MODERATION_MODEL)
+        if cached_categories is not None:
+            self.stats['cache_hits'] += 1
+            row.update(cached_categories)
+            return
+
+        key = cache_key('moderation', text, MODERATION_MODEL)
+        if key in self._waiting:
+            self.stats['duplicates'] += 1
+            self._waiting[key].append(row)
+            return
+        self._waiting[key] = [row]
+
+        if self._pending and self._pending_chars + len(text) > self.batch_chars:
+            self._send()
+        self._pending.append((key, text))
+        self._pending_chars += len(text)
+        if len(self._pending) == self.batch_size:
+            self._send()
+
+    def _send(self):
+        batch = self._pending
+        self._pending = []
+        self._pending_chars = 0
+        self.stats['sent'] += len(batch)
+        self.stats['requests'] += 1
+        self._futures.append((batch, self._pool.submit(self._moderate, [text for _, text in batch])))
+
+    def _moderate(self, texts):
+        response = self.openai_client.moderations.create(model=MODERATION_MODEL, input=texts)
+        # Results come back in input order
+        return [category_dict(result) for result in response.results]
+
+    def flush(self):
+        # Sends what is left, waits for every request and fills in the rows. Returns the stats.
+        if self._pending:
+            self._send()
+
+        futures, self._futures = self._futures, []
+        for batch, future in futures:
+            for (key, text), categories in zip(batch, future.result()):
+                self.cache.set('moderation', text, MODERATION_MODEL, categories)
+                for row in self._waiting.pop(key):
+                    row.update(categories)
+
+        seconds = time.perf_counter() - self._start
+        print(f"Moderated {self.stats['texts']} texts with {self.stats['requests']} requests "
+              f"({self.stats['cache_hits']} cached, {self.stats['duplicates']} duplicates) in {seconds:.2f}s")
+        return dict(self.stats, seconds=seconds)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Batches still queued when a block fails are dropped instead of being sent
+        self._pool.shutdown(wait=False, cancel_futures=True)
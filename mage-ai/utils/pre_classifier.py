@@ -0,0 +1,107 @@
+import os
+import time
+import pandas as pd
+from utils import safefeed_backend  # makes backend/ importable
+import chunking
+import resources
+from utils.moderation_client import CATEGORY_COLUMNS
+
+
+# Local CPU pre-classifier in front of the Assistants run in submission_content_moderation.
+# A post is auto-cleared only when it is confidently benign:
+#   - the OpenAI moderation call in reddit_scrapper_v2 did not flag it or set any category,
+#   - it has no image (image tags are judged by the assistant) unless PRECLASSIFIER_CLEAR_IMAGES=true,
+#   - its MiniLM embedding is far from every policy passage in the passage index
+#     (RETRIEVAL_MODE=passage), i.e. the best cosine similarity is below
+#     PRECLASSIFIER_MAX_POLICY_SIMILARITY.
+# Everything else (flagged, image, or close to a policy) still goes to the LLM.
+# Off by default: a cleared post is never seen by the LLM, so before setting
+# PRECLASSIFIER_ENABLED=true pick the cutoff with utils/calibrate_pre_classifier.py, which reports
+# the false-clear rate of each cutoff on posts the LLM has already labelled.
+
+ENABLED = os.getenv('PRECLASSIFIER_ENABLED', 'false').lower() == 'true'
+MAX_POLICY_SIMILARITY = float(os.getenv('PRECLASSIFIER_MAX_POLICY_SIMILARITY', '0.25'))
+CLEAR_IMAGES = os.getenv('PRECLASSIFIER_CLEAR_IMAGES', 'false').lower() == 'true'
+
+# Routing decisions
+CLEAR = 'clear'
+FLAGGED = 'flagged'
+IMAGE = 'image'
+UNCERTAIN = 'uncertain'
+DISABLED = 'disabled'
+
+
+def is_flagged(row):
+    return any(bool(row[column]) for column in CATEGORY_COLUMNS if column in row.index and pd.notna(row[column]))
+
+
+def has_image(row):
+    caption = row.get('IMAGE_CAPTION')
+    return caption is not None and not (isinstance(caption, float) and pd.isna(caption)) and bool(caption)
+
+
+def post_text(row):
+    return f"{row['SUBMISSION_TITLE']}: {row['SUBMISSION_TEXT']}"
+
+
+def policy_similarity(texts):
+    # Best cosine similarity of each post to a policy passage (one batched encoder pass)
+    if not texts:
+        return []
+    if chunking.RETRIEVAL_MODE != 'passage':
+        # Whole-document vectors average a policy out, so short posts score low against all of them
+        raise ValueError("The pre-classifier scores against the passage index; set RETRIEVAL_MODE=passage")
+    store = resources.get_vector_store()
+    similarities = []
+    for vector in resources.encode_batch(texts):
+        matches = store.query(vector, top_k=1)
+        if matches and chunking.parent_key(matches[0]['id']) == matches[0]['id']:
+            raise ValueError("The policy index holds whole documents; re-vectorize with RETRIEVAL_MODE=passage")
+        similarities.append(matches[0]['score'] if matches else 0.0)
+    return similarities
+
+
+def score_posts(data):
+    # Returns ({row index: FLAGGED or IMAGE}, {row index: policy similarity}) for the other rows
+    decisions = {}
+    candidates = []
+    for index, row in data.iterrows():
+        if is_flagged(row):
+            decisions[index] = FLAGGED
+        elif has_image(row) and not CLEAR_IMAGES:
+            decisions[index] = IMAGE
+        else:
+            candidates.append((index, post_text(row)))
+
+    similarities = policy_similarity([text for _, text in candidates])
+    return decisions, {index: similarity for (index, _), similarity in zip(candidates, similarities)}
+
+
+def route_posts(data):
+    # Returns ({row index: decision}, report). Only CLEAR rows may skip the LLM.
+    start = time.perf_counter()
+    decisions = {}
+
+    if not ENABLED:
+        decisions = {index: DISABLED for index in data.index}
+    else:
+        decisions, similarities = score_posts(data)
+        for index, similarity in similarities.items():
+            decisions[index] = CLEAR if similarity < MAX_POLICY_SIMILARITY else UNCERTAIN
+
+    values = list(decisions.values())
+    counts = {decision: values.count(decision) for decision in (CLEAR, FLAGGED, IMAGE, UNCERTAIN, DISABLED)}
+    report = {
+        'rows': len(decisions),
+        **counts,
+        'sent_to_llm': len(decisions) - counts[CLEAR],
+        'short_circuit_fraction': counts[CLEAR] / len(decisions) if decisions else 0.0,
+        'max_policy_similarity': MAX_POLICY_SIMILARITY,
+        'seconds': time.perf_counter() - start,
+    }
+    print(f"Pre-classifier: cleared {counts[CLEAR]}/{len(decisions)} posts locally "
+          f"({report['short_circuit_fraction']:.1%}), {report['sent_to_llm']} sent to the LLM "
+          f"({counts[FLAGGED]} flagged, {counts[IMAGE]} with images, {counts[UNCERTAIN]} close to a policy) "
+          f"in {report['seconds']:.2f}s")
+
+    return decisions, report
@@ -0,0 +1,65 @@
+import re
+import string
+import emoji
+
+
+# Text preprocessing shared by the submission and comment loaders, per text or for a whole Series.
+# The output is the same as the per-row functions the loaders used to define:
+#   preprocess_text     lowercase, drop URLs, drop punctuation, spell emojis out (" thumbs_up ")
+#   extract_image_url   first image URL in a post body, or None
+# The patterns and the punctuation table are built once. emoji.demojize is by far the slowest step
+# and walks every character, so it only sees the runs of non-ASCII characters (every emoji is one,
+# plus the ASCII base of a keycap like 1️⃣); the ASCII text in between is left as it is.
+
+URL_PATTERN = re.compile(r'http\S+')
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+EMOJI_RUN_PATTERN = re.compile(r'[#*0-9]?[^\x00-\x7f]+')
+
+# A URL ending in an image extension, or any URL that mentions one
+IMAGE_URL_PATTERN = re.compile(r"https?://[^\s\[\]]+\.(?:jpg|jpeg|png|gif)(?=\s|\[|\])")
+ANY_URL_PATTERN = re.compile(r"https?://\S+")
+IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
+
+
+def replace_emojis(text):
+    return emoji.demojize(text, delimiters=(" ", " "))
+
+
+def _replace_emoji_run(match):
+    return replace_emojis(match.group())
+
+
+def preprocess_text(text):
+    text = text.lower()
+    text = URL_PATTERN.sub('', text)
+    text = text.translate(PUNCTUATION_TABLE)
+    if not text.isascii():
+        text = EMOJI_RUN_PATTERN.sub(_replace_emoji_run, text)
+    return text
+
+
+def preprocess_series(texts):
+    # Series of texts -> Series of preprocessed texts, same index (missing values stay missing)
+    texts = texts.str.lower()
+    texts = texts.str.replace(URL_PATTERN, '', regex=True)
+    texts = texts.str.translate(PUNCTUATION_TABLE)
+
+    non_ascii = ~texts.map(str.isascii, na_action='ignore').fillna(True).astype(bool)
+    if non_ascii.any():
+        texts = texts.copy()
+        texts[non_ascii] = texts[non_ascii].str.replace(EMOJI_RUN_PATTERN, _replace_emoji_run, regex=True)
+    return texts
+
+
+def extract_image_url(text):
+    match = IMAGE_URL_PATTERN.search(text)
+    if match:
+        return match.group()
+    match = ANY_URL_PATTERN.search(text)
+    if match:
+        url = match.group()
+        # Check if the URL contains any of the specified image extensions
+        if any(ext in url.lower() for ext in IMAGE_EXTENSIONS):
+            return url
+    return None
+
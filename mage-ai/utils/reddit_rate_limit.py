@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from prawcore.requestor import Requestor
+
+
+# Process-wide limit on Reddit API requests, shared by every PRAW instance that loads subreddits
+# concurrently (PRAW itself is not thread safe, so each worker thread has its own instance, but
+# Reddit counts the requests of all of them against the same OAuth client).
+#   - A token bucket starts at REDDIT_REQUESTS_PER_MINUTE (Reddit's free tier is 100 per minute)
+#     with bursts of up to REDDIT_BURST requests.
+#   - Every response's X-Ratelimit-Remaining / X-Ratelimit-Reset headers re-pace the bucket to
+#     spread what is left of the window evenly until it resets.
+#   - Waiting requests are served first come, first served. Each worker has at most one request
+#     waiting, so every subreddit being loaded gets the same share of the budget, however large it is.
+# request_stats() counts a worker's requests and rate-limit waits, for the per-subreddit report.
+
+REQUESTS_PER_MINUTE = float(os.getenv('REDDIT_REQUESTS_PER_MINUTE', '100'))
+BURST = float(os.getenv('REDDIT_BURST', '10'))
+
+
+class TokenBucket:
+
+    def __init__(self, rate=REQUESTS_PER_MINUTE / 60, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._queue = deque()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        # Blocks until a token is available; returns the seconds spent waiting
+        ticket = object()
+        start = time.monotonic()
+        with self._condition:
+            self._queue.append(ticket)
+            while True:
+                self._refill()
+                if self._queue[0] is ticket and self._tokens >= 1:
+                    break
+                # Only the head of the queue waits for a token; the others wait for their turn
+                self._condition.wait((1 - self._tokens) / self.rate if self._queue[0] is ticket else None)
+            self._tokens -= 1
+            self._queue.popleft()
+            self._condition.notify_all()
+        return time.monotonic() - start
+
+    def update(self, remaining, reset_seconds):
+        # What is left of the current window, spread evenly until it resets
+        with self._condition:
+            self._refill()
+            self._tokens = min(self._tokens, max(remaining, 0.0))
+            self.rate = max(remaining, 1.0) / max(reset_seconds, 1.0)
+            self._condition.notify_all()
+
+    def update_from_headers(self, headers):
+        remaining = headers.get('x-ratelimit-remaining')
+        reset = headers.get('x-ratelimit-reset')
+        if remaining is not None and reset is not None:
+            self.update(float(remaining), float(reset))
+
+
+bucket = TokenBucket()
+
+_local = threading.local()
+
+
+@contextmanager
+def request_stats():
+    # Counts the API requests this thread makes inside the block, and the time they waited for a token
+    previous = getattr(_local, 'stats', None)
+    _local.stats = {'api_requests': 0, 'rate_limit_wait_seconds': 0.0}
+    try:
+        yield _local.stats
+    finally:
+        _local.stats = previous
+
+
+class ThrottledRequestor(Requestor):
+    # Pass as praw.Reddit(..., requestor_class=ThrottledRequestor) so every API call takes a token
+
+    def request(self, *args, **kwargs):
+        waited = bucket.acquire()
+        stats = getattr(_local, 'stats', None)
+        if stats is not None:
+            stats['api_requests'] += 1
+            stats['rate_limit_wait_seconds'] += waited
+        response = super().request(*args, **kwargs)
+        bucket.update_from_headers(response.headers)
+        return response
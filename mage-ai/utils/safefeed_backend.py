@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Modules shared with the FastAPI backend (e.g. verdict_cache) live in backend/.
+# Importing this module makes them importable from the Mage blocks.
+BACKEND_PATH = os.getenv(
+    'SAFEFEED_BACKEND_PATH',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+)
+
+if BACKEND_PATH not in sys.path:
+    sys.path.append(BACKEND_PATH)
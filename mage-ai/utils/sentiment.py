@@ -0,0 +1,70 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+
+# VADER sentiment for posts and comments, shared by the loaders.
+# The analyzer (and its lexicon, read from disk) is built once per process instead of once per
+# text. score_series() scores a whole Series: identical texts are scored once, and batches of at
+# least SENTIMENT_PROCESS_MIN_ROWS texts are split across SENTIMENT_PROCESSES worker processes
+# (each loads the lexicon once). The default of 1 process scores in this process.
+# Categories use the compound score, as before: > 0 Positive, < 0 Negative, otherwise Neutral.
+
+CATEGORIES = ['Negative', 'Neutral', 'Positive']
+
+PROCESSES = int(os.getenv('SENTIMENT_PROCESSES', '1'))
+PROCESS_MIN_ROWS = int(os.getenv('SENTIMENT_PROCESS_MIN_ROWS', '20000'))
+
+_analyzer = None
+
+
+def get_analyzer():
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def category(compound):
+    if compound > 0:
+        return 'Positive'
+    elif compound < 0:
+        return 'Negative'
+    else:
+        return 'Neutral'
+
+
+def get_sentiment(text):
+    return category(get_analyzer().polarity_scores(text)['compound'])
+
+
+def score_texts(texts):
+    # list of texts -> list of categories; also the unit of work of a pool process
+    polarity_scores = get_analyzer().polarity_scores
+    return [category(polarity_scores(text)['compound']) for text in texts]
+
+
+def score_series(texts, processes=None):
+    # Series (or list) of preprocessed texts -> categorical SENTIMENT_CATEGORY Series, same index
+    texts = pd.Series(texts) if not isinstance(texts, pd.Series) else texts
+    processes = PROCESSES if processes is None else processes
+
+    texts = texts.fillna('').astype(str)
+    unique_texts = list(dict.fromkeys(texts))
+    if processes > 1 and len(unique_texts) >= PROCESS_MIN_ROWS:
+        # A few chunks per process, so one slow chunk doesn't leave the others idle
+        size = math.ceil(len(unique_texts) / (processes * 4))
+        chunks = [unique_texts[i:i + size] for i in range(0, len(unique_texts), size)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            categories = [result for chunk in pool.map(score_texts, chunks) for result in chunk]
+    else:
+        categories = score_texts(unique_texts)
+
+    codes = {text: CATEGORIES.index(result) for text, result in zip(unique_texts, categories)}
+    return pd.Series(
+        pd.Categorical.from_codes(texts.map(codes).to_numpy(), categories=CATEGORIES),
+        index=texts.index,
+        name='SENTIMENT_CATEGORY',
+    )